@@ -6,36 +6,101 @@ Run this file to start the complete application
 import os
 import sys
 import time
-import webbrowser
+import importlib.util
+import socket
+import subprocess
 import threading
 from pathlib import Path
 
+import daemon
+import warm_imports
+
+ROOT = Path.cwd()
+READY_FILE = ROOT / 'therapy_data' / '.ready'
+
+REQUIRED_FILES = [
+    'socialworkcountry.py',
+    'web_common.py',
+    'input_validation.py',
+    'enhanced_therapy_backend.py',
+    'client.html',
+    'requirements.txt'
+]
+
+RUNNING_BANNER = "\n".join([
+    "",
+    "=" * 80,
+    "🌐 WEBSITE IS NOW RUNNING!",
+    "=" * 80,
+    "📱 Main interface: http://localhost:5000",
+    "📊 Features available:",
+    "   - Patient Enrollment",
+    "   - Daily Check-ins (Emotional, Medication, Physical)",
+    "   - Weekly Progress Reports",
+    "   - Excel Export with Tab Separation",
+    "   - Email Report Generation",
+    "   - Social Worker Assessment",
+    "=" * 80,
+    "",
+    "🎯 HOW TO USE:",
+    "1. Enroll patients with therapist information",
+    "2. Collect daily check-ins for 7 days",
+    "3. Generate weekly reports",
+    "4. Export to Excel or email to therapist",
+    "",
+    "🛑 Press CTRL+C to stop the server",
+    "📊 Server logs will appear below:",
+    "-" * 80,
+])
+
+
+def emit(lines):
+    """Write a block of lines to stdout with a single write call"""
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+
+def list_project_files():
+    """Map entry names to DirEntry objects for the project directory (one scandir pass)"""
+    with os.scandir(ROOT) as entries:
+        return {entry.name: entry for entry in entries}
+
+
+def prerequisites_cached(entries):
+    """Check if the last successful launch is newer than every required file"""
+    try:
+        ready_mtime = READY_FILE.stat().st_mtime
+        return all(entries[f].stat().st_mtime <= ready_mtime for f in REQUIRED_FILES)
+    except (OSError, KeyError):
+        return False
+
+
+def mark_ready():
+    """Record a successful launch so the next one can skip the prerequisite checks"""
+    try:
+        READY_FILE.touch()
+    except OSError:
+        pass
+
 
 def print_banner():
     """Print startup banner"""
-    print("=" * 80)
-    print("🏥 THERAPEUTIC SOCIAL COMPANION")
-    print("=" * 80)
-    print("🚀 Starting complete full-stack application...")
-    print("📁 Project directory:", os.getcwd())
-    print("🐍 Python version:", sys.version.split()[0])
-    print("=" * 80)
+    emit([
+        "=" * 80,
+        "🏥 THERAPEUTIC SOCIAL COMPANION",
+        "=" * 80,
+        "🚀 Starting complete full-stack application...",
+        f"📁 Project directory: {ROOT}",
+        f"🐍 Python version: {sys.version.split()[0]}",
+        "=" * 80,
+    ])
 
 
-def check_files():
+def check_files(names=None):
     """Check if all required files exist"""
-    required_files = [
-        'socialworkcountry.py',
-        'input_validation.py',
-        'enhanced_therapy_backend.py',
-        'client.html',
-        'requirements.txt'
-    ]
-
-    missing_files = []
-    for file in required_files:
-        if not Path(file).exists():
-            missing_files.append(file)
+    if names is None:
+        names = list_project_files()
+    missing_files = [f for f in REQUIRED_FILES if f not in names]
 
     if missing_files:
         print("❌ Missing required files:")
@@ -49,47 +114,99 @@ def check_files():
 
 
 def check_dependencies():
-    """Check if required packages are installed"""
-    try:
-        import flask
-        import flask_cors
-        print(f"✅ Flask {flask.__version__} installed")
-        print("✅ Flask-CORS installed")
-        return True
-    except ImportError as e:
-        print(f"❌ Missing dependency: {e}")
-        print("💡 Run in terminal: pip install -r requirements.txt")
-        print("💡 Or use: python -m pip install -r requirements.txt")
-        return False
+    """Check if required packages are installed (without importing them)"""
+    for module in ('flask', 'flask_cors'):
+        if importlib.util.find_spec(module) is None:
+            print(f"❌ Missing dependency: No module named '{module}'")
+            print("💡 Run in terminal: pip install -r requirements.txt")
+            print("💡 Or use: python -m pip install -r requirements.txt")
+            return False
+
+    print("✅ Flask installed")
+    print("✅ Flask-CORS installed")
+    return True
+
+
+def wait_for_server(host='127.0.0.1', port=5000, timeout=10.0, interval=0.05):
+    """Poll until the server accepts connections or the timeout expires"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            if sock.connect_ex((host, port)) == 0:
+                return True
+        time.sleep(interval)
+    return False
+
+
+def launch_url(url):
+    """Open a URL with the platform launcher, bypassing webbrowser's browser probing"""
+    if sys.platform.startswith('linux'):
+        subprocess.Popen(['xdg-open', url], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    elif sys.platform == 'darwin':
+        subprocess.Popen(['open', url], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    elif os.name == 'nt':
+        os.startfile(url)
+    else:
+        import webbrowser  # Imported here to keep it off the startup path
+        webbrowser.open(url)
 
 
 def open_browser_delayed():
-    """Open browser after a short delay"""
-    time.sleep(3)  # Wait for server to start
+    """Open browser as soon as the server is listening"""
+    wait_for_server()  # Wait for server to start
     print("🌐 Opening browser automatically...")
     try:
-        webbrowser.open('http://localhost:5000')
+        launch_url('http://localhost:5000')
         print("✅ Browser opened successfully")
     except Exception as e:
         print(f"⚠️ Could not open browser automatically: {e}")
         print("💡 Manually open: http://localhost:5000")
 
 
+def start_via_daemon(conn):
+    """Let a warm launcher daemon run the server for this terminal"""
+    browser_thread = threading.Thread(target=open_browser_delayed)
+    browser_thread.daemon = True
+    browser_thread.start()
+
+    emit(["✅ Connected to warm launcher daemon", RUNNING_BANNER])
+    try:
+        daemon.wait(conn)
+    except KeyboardInterrupt:
+        print("\n\n🛑 Server stopped by user")
+        print("✅ Application shut down successfully")
+
+
 def start_application():
     """Start the complete application"""
     print_banner()
 
-    # Check prerequisites
-    if not check_files():
-        input("\nPress Enter to exit...")
+    # Reuse a pre-warmed server process when one is running (POSIX only)
+    conn = daemon.connect(ROOT / daemon.SOCKET_PATH)
+    if conn is not None:
+        start_via_daemon(conn)
         return
 
-    if not check_dependencies():
-        input("\nPress Enter to exit...")
-        return
+    # Check prerequisites (skipped when nothing changed since the last good launch)
+    entries = list_project_files()
+    if not prerequisites_cached(entries):
+        if not check_files(entries):
+            input("\nPress Enter to exit...")
+            return
+
+        if not check_dependencies():
+            input("\nPress Enter to exit...")
+            return
 
     print("\n🔄 Starting Flask backend server...")
 
+    # Warm up a launcher daemon so the next launch starts instantly (opt-in: THERAPY_DAEMON=1)
+    daemon.spawn(ROOT / daemon.SOCKET_PATH)
+
+    # Add current directory to Python path
+    if '.' not in sys.path:
+        sys.path.insert(0, '.')
+
     # Schedule browser opening
     browser_thread = threading.Thread(target=open_browser_delayed)
     browser_thread.daemon = True
@@ -97,43 +214,30 @@ def start_application():
 
     # Import and run the web backend
     try:
-        # Add current directory to Python path
-        if '.' not in sys.path:
-            sys.path.insert(0, '.')
+        # Resolve modules from last launch's recorded locations
+        warm_imports.install(ROOT / warm_imports.CACHE_PATH)
+
+        import flask
+        print(f"✅ Flask {flask.__version__} ready")
 
         from enhanced_therapy_backend import app
-        print("✅ Web backend imported successfully")
-        print("✅ Therapy companion logic loaded")
-        print("✅ Social worker assessment logic loaded")
-        print("✅ Input validation system loaded")
-
-        print("\n" + "=" * 80)
-        print("🌐 WEBSITE IS NOW RUNNING!")
-        print("=" * 80)
-        print("📱 Main interface: http://localhost:5000")
-        print("📊 Features available:")
-        print("   - Patient Enrollment")
-        print("   - Daily Check-ins (Emotional, Medication, Physical)")
-        print("   - Weekly Progress Reports")
-        print("   - Excel Export with Tab Separation")
-        print("   - Email Report Generation")
-        print("   - Social Worker Assessment")
-        print("=" * 80)
-        print("\n🎯 HOW TO USE:")
-        print("1. Enroll patients with therapist information")
-        print("2. Collect daily check-ins for 7 days")
-        print("3. Generate weekly reports")
-        print("4. Export to Excel or email to therapist")
-        print("\n🛑 Press CTRL+C to stop the server")
-        print("📊 Server logs will appear below:")
-        print("-" * 80)
-
-        # Run Flask app
+        warm_imports.record(ROOT / warm_imports.CACHE_PATH)
+        mark_ready()
+        emit([
+            "✅ Web backend imported successfully",
+            "✅ Therapy companion logic loaded",
+            "✅ Social worker assessment logic loaded",
+            "✅ Input validation system loaded",
+            RUNNING_BANNER,
+        ])
+
+        # Run Flask app (set THERAPY_DEBUG=1 to enable the Werkzeug debugger)
         app.run(
             host='127.0.0.1',
             port=5000,
-            debug=True,
-            use_reloader=False  # Disable reloader to avoid conflicts
+            debug=os.environ.get('THERAPY_DEBUG') == '1',
+            use_reloader=False,  # Disable reloader to avoid conflicts
+            threaded=True
         )
 
     except ImportError as e:
@@ -152,28 +256,32 @@ def start_application():
 
 def show_project_info():
     """Show information about the project structure"""
-    print("\n📁 PROJECT STRUCTURE:")
-    print("-" * 50)
-
     files_info = {
         'client.html': 'Web interface with therapy tracking',
         'socialworkcountry.py': 'Social worker assessment logic',
+        'web_common.py': 'Helpers shared by the web backends',
         'input_validation.py': 'Input validation system',
         'enhanced_therapy_backend.py': 'Flask server and API endpoints',
         'requirements.txt': 'Python package dependencies',
         'main.py': 'This runner script'
     }
 
+    names = list_project_files()
+    lines = ["", "📁 PROJECT STRUCTURE:", "-" * 50]
     for filename, description in files_info.items():
-        status = "✅" if Path(filename).exists() else "❌"
-        print(f"{status} {filename:<25} - {description}")
-
-    print("\n🔧 SETUP INSTRUCTIONS:")
-    print("-" * 50)
-    print("1. Install packages: pip install -r requirements.txt")
-    print("2. Run this file: python main.py")
-    print("3. Website opens automatically in browser")
-    print("4. Data is saved locally in therapy_data/ folder")
+        status = "✅" if filename in names else "❌"
+        lines.append(f"{status} {filename:<25} - {description}")
+
+    lines += [
+        "",
+        "🔧 SETUP INSTRUCTIONS:",
+        "-" * 50,
+        "1. Install packages: pip install -r requirements.txt",
+        "2. Run this file: python main.py",
+        "3. Website opens automatically in browser",
+        "4. Data is saved locally in therapy_data/ folder",
+    ]
+    emit(lines)
 
 
 if __name__ == "__main__":
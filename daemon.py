@@ -0,0 +1,217 @@
+"""
+Prefork launcher daemon for the Therapeutic Social Companion Website
+Keeps the web backend imported in a long-lived parent process and forks a
+fresh server for every launch, so repeat launches skip Python and Flask
+start-up. POSIX only - other platforms use the regular start-up path.
+
+Opt-in: the launcher only starts a daemon when THERAPY_DAEMON=1 is set.
+The daemon exits when a project source file changes (the next launch then
+starts a fresh one), after IDLE_TIMEOUT seconds without a launch, or when
+asked to with: python daemon.py stop
+"""
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+SOCKET_PATH = Path('therapy_data') / '.daemon.sock'
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+IDLE_TIMEOUT = float(os.environ.get('THERAPY_DAEMON_IDLE', 3600))
+ACK_TIMEOUT = 5.0
+
+
+def is_supported():
+    """Check if this platform can fork and pass file descriptors"""
+    return hasattr(os, 'fork') and hasattr(socket, 'AF_UNIX') and hasattr(socket, 'send_fds')
+
+
+def source_signature():
+    """Map project source files to their modification times"""
+    with os.scandir(PROJECT_DIR) as entries:
+        return {
+            entry.name: entry.stat().st_mtime
+            for entry in entries
+            if entry.name.endswith(('.py', '.html')) and entry.is_file()
+        }
+
+
+def connect(path=SOCKET_PATH):
+    """Hand this terminal to a running daemon; return the connection or None"""
+    if not is_supported() or not path.exists():
+        return None
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    message = b'launch-debug' if os.environ.get('THERAPY_DEBUG') == '1' else b'launch'
+    try:
+        client.settimeout(ACK_TIMEOUT)
+        client.connect(str(path))
+        # Pass stdin/stdout/stderr so the forked server logs to this terminal
+        socket.send_fds(client, [message], [0, 1, 2])
+        # A daemon running outdated code closes the connection instead of acknowledging
+        if client.recv(1) != b'+':
+            raise ConnectionRefusedError('daemon declined the launch')
+        client.settimeout(None)
+    except OSError:
+        client.close()
+        return None
+    return client
+
+
+def wait(client):
+    """Block until the forked server exits (the daemon closes the connection)"""
+    try:
+        while client.recv(1):
+            pass
+    finally:
+        client.close()
+
+
+def _is_listening(path):
+    """Check if a daemon accepts connections on the socket path"""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(path))
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def spawn(path=SOCKET_PATH):
+    """Start the daemon in the background for the next launch"""
+    if not is_supported() or os.environ.get('THERAPY_DAEMON') != '1':
+        return
+    if path.exists():
+        if _is_listening(path):
+            return
+        # Left behind by a daemon that was killed - it would block spawning forever
+        try:
+            path.unlink()
+        except OSError:
+            return
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+
+
+def stop(path=SOCKET_PATH):
+    """Ask a running daemon to exit; return True if one was running"""
+    if not is_supported() or not path.exists():
+        return False
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(str(path))
+        client.sendall(b'stop')
+        client.recv(1)  # Returns once the daemon has closed the connection
+    except OSError:
+        return False
+    finally:
+        client.close()
+    return True
+
+
+def _stop_on_hangup(conn):
+    """Stop the forked server when the launching terminal goes away"""
+    try:
+        while conn.recv(1):
+            pass
+    except OSError:
+        pass
+    # Interrupts app.run in the main thread, which then shuts down like a CTRL+C
+    os.kill(os.getpid(), signal.SIGINT)
+
+
+def _serve_client(conn, fds, app, debug):
+    """Run one server instance inside a forked child, then exit the child"""
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)  # The server may wait on its own children
+    for target, fd in zip((0, 1, 2), fds):
+        os.dup2(fd, target)
+        os.close(fd)
+
+    conn.sendall(b'+')
+    threading.Thread(target=_stop_on_hangup, args=(conn,), daemon=True).start()
+
+    app.run(
+        host='127.0.0.1',
+        port=5000,
+        debug=debug,
+        use_reloader=False,
+        threaded=True
+    )
+
+    # A normal exit waits for background check-in deletes and runs the atexit log flush
+    sys.exit(0)
+
+
+def serve(path=SOCKET_PATH):
+    """Import the backend once, then fork a server for each launch request"""
+    # Taken before the import so edits made while importing also count as changes
+    signature = source_signature()
+
+    # Imported in the parent so forked children inherit the warm module cache
+    from enhanced_therapy_backend import app
+
+    if path.exists():
+        path.unlink()
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    server.listen()
+    server.settimeout(IDLE_TIMEOUT)
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # Reap finished servers automatically
+
+    is_parent = True
+    try:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                break  # Idle for too long
+
+            conn.settimeout(ACK_TIMEOUT)
+            try:
+                message, fds, _, _ = socket.recv_fds(conn, 16, 3)
+            except OSError:
+                conn.close()
+                continue
+            conn.settimeout(None)
+
+            launch = message in (b'launch', b'launch-debug') and len(fds) == 3
+            current = launch and source_signature() == signature
+            if current and os.fork() == 0:
+                is_parent = False
+                server.close()
+                _serve_client(conn, fds, app, debug=message == b'launch-debug')
+
+            for fd in fds:
+                os.close(fd)
+            if message == b'stop' or (launch and not current):
+                # Outdated code: refuse, so the launcher starts normally and spawns a fresh daemon
+                path.unlink()
+                conn.close()
+                break
+            conn.close()
+    finally:
+        # The socket belongs to the daemon, not to the servers it forked
+        if is_parent:
+            server.close()
+            if path.exists():
+                path.unlink()
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, PROJECT_DIR)
+    if sys.argv[1:] == ['stop']:
+        print("🛑 Launcher daemon stopped" if stop() else "ℹ️ No launcher daemon running")
+    else:
+        serve()
@@ -4,27 +4,36 @@ Supports complete weekly tracking with Excel export
 Deployment-ready with security features and multi-user support
 """
 
-from flask import Flask, request, jsonify, send_file, Response, session
+from flask import Flask, request, jsonify, send_file, Response, session, copy_current_request_context
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from functools import wraps
+from limits import parse as parse_limit
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter, MovingWindowRateLimiter
+from functools import wraps, lru_cache
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict, deque
 import json
 import os
 import io
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from pathlib import Path
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+import xlsxwriter
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
-from email import encoders
+import base64
 import hashlib
+import hmac
 import secrets
 import shutil
+import threading
+import time
+import queue
+import atexit
 
 
 print("=" * 50)
@@ -55,17 +64,44 @@ except ImportError:
 try:
     import sendgrid
     from sendgrid.helpers.mail import Mail, Attachment, FileContent, FileName, FileType, Disposition
-    import base64
 
     SENDGRID_AVAILABLE = True
 except ImportError:
     SENDGRID_AVAILABLE = False
 
+# Optional: orjson support for faster JSON file persistence
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Optional: fcntl file locks (POSIX only) keep activity log lines whole across processes
+try:
+    import fcntl
+
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# Optional: pybase64 (SIMD base64) for encoding email attachments
+try:
+    import pybase64
+
+    PYBASE64_AVAILABLE = True
+except ImportError:
+    PYBASE64_AVAILABLE = False
+
 # Import the social worker components
 from socialworkcountry import GlobalSocialWorkerChatbot, PatientProfile
+from web_common import OrjsonProvider, load_index_page, read_json_file, write_json_file
+
 
 # Create Flask app
 app = Flask(__name__)
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
 
 # Configure CORS for production
 if os.environ.get('PRODUCTION'):
@@ -81,25 +117,61 @@ if os.environ.get('PRODUCTION'):
     app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 
 # Initialize rate limiter
+# Counters live in process memory by default; set RATELIMIT_STORAGE_URI (or attach a Redis
+# instance, which sets REDIS_URL) to share them between workers, where a fixed window costs
+# one INCR per request
+RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI') or os.environ.get('REDIS_URL') or 'memory://'
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"]
+    default_limits=["200 per day", "50 per hour"],
+    storage_uri=RATELIMIT_STORAGE_URI,
+    strategy='moving-window' if RATELIMIT_STORAGE_URI.startswith('memory://') else 'fixed-window'
 )
 
-# Create data directories
-os.makedirs('therapy_data', exist_ok=True)
-os.makedirs('therapy_data/patients', exist_ok=True)
-os.makedirs('therapy_data/checkins', exist_ok=True)
-os.makedirs('therapy_data/reports', exist_ok=True)
-os.makedirs('therapy_data/excel_exports', exist_ok=True)
-os.makedirs('therapy_data/therapists', exist_ok=True)
-os.makedirs('therapy_data/logs', exist_ok=True)
-
 # Initialize the social worker chatbot
 chatbot = GlobalSocialWorkerChatbot()
 
 
+# ============= JSON PERSISTENCE =============
+
+def replace_json_file(path, data, indent=False):
+    """Save a JSON file through a temporary file and os.replace, so readers never see it half-written"""
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    write_json_file(temp_path, data, indent)
+    os.replace(temp_path, path)
+
+
+def scan_files(directory, suffix='.json'):
+    """List the directory entries of the files ending in suffix (empty if the directory is missing)"""
+    try:
+        with os.scandir(directory) as entries:
+            return [entry for entry in entries if entry.name.endswith(suffix) and entry.is_file()]
+    except FileNotFoundError:
+        return []
+
+
+_KNOWN_DIRS = set()  # Directories this process already created or found
+
+
+def ensure_dir(directory):
+    """Create a directory unless this process already made sure it exists"""
+    if directory in _KNOWN_DIRS:
+        return
+    os.makedirs(directory, exist_ok=True)
+    _KNOWN_DIRS.add(directory)
+
+
+def forget_dir(directory):
+    """Call after removing a directory so ensure_dir recreates it"""
+    _KNOWN_DIRS.discard(directory)
+
+
+# Create data directories once at start-up (later ensure_dir calls for them are set lookups)
+for data_dir in ('patients', 'checkins', 'reports', 'excel_exports', 'therapists', 'logs', 'jobs'):
+    ensure_dir(os.path.join('therapy_data', data_dir))
+
+
 # ============= AUTHENTICATION SYSTEM =============
 
 def generate_access_token():
@@ -107,25 +179,206 @@ def generate_access_token():
     return secrets.token_urlsafe(32)
 
 
-def hash_password(password):
-    """Hash a password for storing"""
-    return hashlib.sha256(password.encode()).hexdigest()
+def hash_password(password, salt=None):
+    """Hash a password with a random salt for storing ("sha256$salt$digest", base64)"""
+    if salt is None:
+        salt = secrets.token_bytes(16)
+    digest = hashlib.sha256(salt + password.encode('utf-8', 'surrogatepass')).digest()
+    return f"sha256${base64.b64encode(salt).decode()}${base64.b64encode(digest).decode()}"
+
+
+def verify_password(password, password_hash):
+    """Check a password against a stored hash in constant time"""
+    if password_hash.startswith('sha256$'):
+        _, salt, digest = password_hash.split('$')
+        expected = base64.b64decode(digest)
+        actual = hashlib.sha256(base64.b64decode(salt) + password.encode('utf-8', 'surrogatepass')).digest()
+        return hmac.compare_digest(expected, actual)
+
+    # Legacy unsalted hex digest
+    return hmac.compare_digest(password_hash, hashlib.sha256(password.encode()).hexdigest())
+
+
+# Access token -> (therapist data, therapist file, file mtime). Lets authentication
+# skip scanning every therapist file; the mtime is re-checked on each hit so tokens
+# rotated by another worker process stop validating.
+_TOKEN_INDEX = {}  # token -> (therapist, therapist file, file mtime)
+_TOKEN_BY_FILE = {}  # therapist file -> (indexed token or None, file mtime)
+_TOKEN_INDEX_LOCK = threading.RLock()
+_token_index_mtime = None
+
+
+def index_therapist_token(therapist, therapist_file, mtime=None):
+    """Index a therapist's current access token in place of the one their file had before"""
+    if mtime is None:
+        mtime = os.stat(therapist_file).st_mtime_ns
+    token = therapist.get('access_token') or None
+    with _TOKEN_INDEX_LOCK:
+        forget_therapist_file(therapist_file)
+        _TOKEN_BY_FILE[therapist_file] = (token, mtime)
+        if token:
+            _TOKEN_INDEX[token] = (therapist, therapist_file, mtime)
+
+
+def forget_therapist_file(therapist_file):
+    """Remove a therapist file and its token from the in-memory index"""
+    with _TOKEN_INDEX_LOCK:
+        token, _ = _TOKEN_BY_FILE.pop(therapist_file, (None, None))
+        if token is not None:
+            _TOKEN_INDEX.pop(token, None)
+
+
+def forget_therapist_token(token):
+    """Remove an access token from the in-memory index"""
+    with _TOKEN_INDEX_LOCK:
+        entry = _TOKEN_INDEX.get(token)
+        if entry is not None:
+            forget_therapist_file(entry[1])
+
+
+def refresh_token_index():
+    """Re-index the therapist files that changed since the therapists directory was last scanned"""
+    global _token_index_mtime
+    therapists_dir = os.path.join('therapy_data', 'therapists')
+    try:
+        mtime = os.stat(therapists_dir).st_mtime_ns
+    except OSError:
+        return
+
+    with _TOKEN_INDEX_LOCK:
+        if mtime == _token_index_mtime:
+            return
+
+        # Therapist files are replaced atomically, so every change shows up in the directory mtime
+        seen = set()
+        for entry in scan_files(therapists_dir):
+            seen.add(entry.path)
+            file_mtime = entry.stat().st_mtime_ns
+            indexed = _TOKEN_BY_FILE.get(entry.path)
+            if indexed is None or indexed[1] != file_mtime:
+                index_therapist_token(read_json_file(entry.path), entry.path, file_mtime)
+
+        for therapist_file in [f for f in _TOKEN_BY_FILE if f not in seen]:
+            forget_therapist_file(therapist_file)
+        # As with the patient index, a directory changed within the last second is scanned again
+        _token_index_mtime = mtime if time.time_ns() - mtime > 1_000_000_000 else None
 
 
 def validate_therapist_token(token):
     """Validate a therapist's access token"""
-    therapists_dir = os.path.join('therapy_data', 'therapists')
-    if not os.path.exists(therapists_dir):
+    if not token:
         return None
 
-    for filename in os.listdir(therapists_dir):
-        if filename.endswith('.json'):
-            with open(os.path.join(therapists_dir, filename), 'r') as f:
-                therapist = json.load(f)
-                if therapist.get('access_token') == token and therapist.get('active', True):
-                    return therapist
+    with _TOKEN_INDEX_LOCK:
+        entry = _TOKEN_INDEX.get(token)
+
+    if entry is None:
+        # Token may have been issued by another worker - rescan only if a therapist file changed
+        refresh_token_index()
+        with _TOKEN_INDEX_LOCK:
+            entry = _TOKEN_INDEX.get(token)
+        if entry is None:
+            return None
+
+    therapist, therapist_file, mtime = entry
+    try:
+        current_mtime = os.stat(therapist_file).st_mtime_ns
+    except OSError:
+        forget_therapist_token(token)
+        return None
 
-    return None
+    if current_mtime != mtime:
+        # File changed since it was indexed (e.g. a new login) - re-read it
+        forget_therapist_token(token)
+        therapist = read_json_file(therapist_file)
+        index_therapist_token(therapist, therapist_file)
+        if therapist.get('access_token') != token:
+            return None
+
+    if not therapist.get('active', True):
+        return None
+    return therapist
+
+
+refresh_token_index()
+
+
+# Patient ID -> patient data, and enrolling therapist -> {patient ID: patient data}.
+# Saves and deletions in this process update the index directly; it is rebuilt
+# when the patients directory changes underneath it (e.g. another worker process).
+_PATIENT_BY_ID = {}
+_PATIENTS_BY_THERAPIST = {}
+_PATIENT_FILE_MTIMES = {}  # patient_id -> st_mtime_ns of the file the indexed data came from
+_PATIENT_INDEX_LOCK = threading.RLock()
+_patient_index_mtime = None
+
+
+def index_patient(patient_id, patient_data, mtime_ns=None):
+    """Add or replace a patient in the in-memory index"""
+    with _PATIENT_INDEX_LOCK:
+        unindex_patient(patient_id)
+        _PATIENT_BY_ID[patient_id] = patient_data
+        _PATIENTS_BY_THERAPIST.setdefault(patient_data.get('enrolledBy'), {})[patient_id] = patient_data
+        _PATIENT_FILE_MTIMES[patient_id] = mtime_ns
+
+
+def unindex_patient(patient_id):
+    """Remove a patient from the in-memory index"""
+    with _PATIENT_INDEX_LOCK:
+        _PATIENT_FILE_MTIMES.pop(patient_id, None)
+        patient_data = _PATIENT_BY_ID.pop(patient_id, None)
+        if patient_data is not None:
+            _PATIENTS_BY_THERAPIST.get(patient_data.get('enrolledBy'), {}).pop(patient_id, None)
+
+
+def refresh_patient_index():
+    """Re-read the patient files that changed since the index was last brought up to date"""
+    global _patient_index_mtime
+    patients_dir = os.path.join('therapy_data', 'patients')
+    try:
+        mtime = os.stat(patients_dir).st_mtime_ns
+    except OSError:
+        return
+
+    with _PATIENT_INDEX_LOCK:
+        if mtime == _patient_index_mtime:
+            return
+
+        # Patient files are replaced atomically, so every change shows up in the directory mtime
+        seen = set()
+        for entry in scan_files(patients_dir):
+            if entry.name.startswith('patient_'):
+                patient_id = entry.name[len('patient_'):-len('.json')]
+                seen.add(patient_id)
+                file_mtime = entry.stat().st_mtime_ns
+                if patient_id not in _PATIENT_BY_ID or _PATIENT_FILE_MTIMES.get(patient_id) != file_mtime:
+                    index_patient(patient_id, read_json_file(entry.path), file_mtime)
+
+        for patient_id in [pid for pid in _PATIENT_BY_ID if pid not in seen]:
+            unindex_patient(patient_id)
+        # Only the mtime taken before the scan is stored, so changes made while scanning are picked
+        # up next time; a directory changed within the last second may still change without its
+        # mtime moving, so it is scanned again until it settles
+        _patient_index_mtime = mtime if time.time_ns() - mtime > 1_000_000_000 else None
+
+
+def get_patient(patient_id):
+    """Look up an enrolled patient's data (None if not enrolled)"""
+    refresh_patient_index()
+    with _PATIENT_INDEX_LOCK:
+        return _PATIENT_BY_ID.get(patient_id)
+
+
+def get_patients_for_therapist(email):
+    """List the patients a therapist enrolled (all patients for the system admin)"""
+    refresh_patient_index()
+    with _PATIENT_INDEX_LOCK:
+        if email == 'admin@system':
+            return list(_PATIENT_BY_ID.values())
+        return list(_PATIENTS_BY_THERAPIST.get(email, {}).values())
+
+
+refresh_patient_index()
 
 
 def require_auth(f):
@@ -176,14 +429,14 @@ def mock_auth(f):
 @app.route('/')
 def index():
     """Serve the main HTML file"""
-    # First try client.html (your file)
-    if os.path.exists('client.html'):
-        with open('client.html', 'r', encoding='utf-8') as f:
-            return f.read()
-    # Fallback to therapy_tracker.html
-    elif os.path.exists('therapy_tracker.html'):
-        with open('therapy_tracker.html', 'r', encoding='utf-8') as f:
-            return f.read()
+    # First try client.html (your file), then fall back to therapy_tracker.html
+    for page_file in ('client.html', 'therapy_tracker.html'):
+        if os.path.exists(page_file):
+            page, etag = load_index_page(page_file)
+            response = Response(page, mimetype='text/html')
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'public, max-age=300'
+            return response.make_conditional(request)
     else:
         return """
         <html>
@@ -227,9 +480,9 @@ def register_therapist():
             'active': True
         }
 
-        os.makedirs(os.path.dirname(therapist_file), exist_ok=True)
-        with open(therapist_file, 'w') as f:
-            json.dump(therapist_data, f, indent=2)
+        replace_json_file(therapist_file, therapist_data)
+        index_therapist_token(therapist_data, therapist_file)
+        update_counter('therapists')
 
         # Log registration
         log_activity('therapist_registration', {'email': data['email']})
@@ -269,11 +522,10 @@ def login_therapist():
         if not os.path.exists(therapist_file):
             return jsonify({'success': False, 'error': 'Invalid credentials'}), 401
 
-        with open(therapist_file, 'r') as f:
-            therapist = json.load(f)
+        therapist = read_json_file(therapist_file)
 
         # Verify password
-        if therapist['password_hash'] != hash_password(password):
+        if not verify_password(password, therapist['password_hash']):
             return jsonify({'success': False, 'error': 'Invalid credentials'}), 401
 
         # Check if account is active
@@ -285,9 +537,13 @@ def login_therapist():
         therapist['access_token'] = new_token
         therapist['last_login'] = datetime.now().isoformat()
 
+        # Upgrade legacy unsalted hashes now that the password is known
+        if not therapist['password_hash'].startswith('sha256$'):
+            therapist['password_hash'] = hash_password(password)
+
         # Save updated data
-        with open(therapist_file, 'w') as f:
-            json.dump(therapist, f, indent=2)
+        replace_json_file(therapist_file, therapist)
+        index_therapist_token(therapist, therapist_file)
 
         # Log login
         log_activity('therapist_login', {'email': email})
@@ -336,8 +592,11 @@ def save_therapy_patient():
         filename = f'patient_{patient_id}.json'
         filepath = os.path.join('therapy_data', 'patients', filename)
 
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(patient_data, f, indent=2, ensure_ascii=False)
+        is_new_patient = not os.path.exists(filepath)
+        replace_json_file(filepath, patient_data)
+        index_patient(patient_id, patient_data, os.stat(filepath).st_mtime_ns)
+        if is_new_patient:
+            update_counter('patients')
 
         # Log activity
         log_activity('patient_enrolled', {
@@ -374,13 +633,10 @@ def save_therapy_checkin():
             }), 400
 
         # Verify patient belongs to therapist's organization
-        patient_file = os.path.join('therapy_data', 'patients', f'patient_{patient_id}.json')
-        if not os.path.exists(patient_file):
+        patient = get_patient(patient_id)
+        if patient is None:
             return jsonify({'success': False, 'error': 'Patient not found'}), 404
 
-        with open(patient_file, 'r') as f:
-            patient = json.load(f)
-
         # Check authorization
         if patient.get('enrolledBy') != request.therapist['email'] and request.therapist['email'] != 'admin@system':
             return jsonify({'success': False, 'error': 'Unauthorized access to patient'}), 403
@@ -400,15 +656,11 @@ def save_therapy_checkin():
 
         # Create patient checkin directory
         patient_dir = os.path.join('therapy_data', 'checkins', patient_id)
-        os.makedirs(patient_dir, exist_ok=True)
+        ensure_dir(patient_dir)
 
-        # Save check-in data
+        # Save check-in data into the patient's file for that week
         date = checkin_data.get('date')
-        filename = f'checkin_{date}.json'
-        filepath = os.path.join(patient_dir, filename)
-
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(checkin_data, f, indent=2, ensure_ascii=False)
+        filename = save_week_checkin(patient_dir, checkin_data)
 
         # Log activity
         log_activity('checkin_recorded', {
@@ -436,42 +688,13 @@ def get_week_data(patient_id, week):
     """Get all check-in data for a specific week"""
     try:
         # Verify authorization
-        patient_file = os.path.join('therapy_data', 'patients', f'patient_{patient_id}.json')
-        if os.path.exists(patient_file):
-            with open(patient_file, 'r') as f:
-                patient = json.load(f)
-
+        patient = get_patient(patient_id)
+        if patient is not None:
             if patient.get('enrolledBy') != request.therapist['email'] and request.therapist['email'] != 'admin@system':
                 return jsonify({'success': False, 'error': 'Unauthorized access'}), 403
 
-        week_data = {}
-        checkin_dir = os.path.join('therapy_data', 'checkins', patient_id)
-
-        if os.path.exists(checkin_dir):
-            # Parse week string
-            year, week_num = week.split('-W')
-            year = int(year)
-            week_num = int(week_num)
-
-            # Calculate week dates
-            jan_4 = datetime(year, 1, 4)
-            week_1_monday = jan_4 - timedelta(days=jan_4.weekday())
-            week_start = week_1_monday + timedelta(weeks=week_num - 1)
-
-            # Get data for each day
-            for i in range(7):
-                date = week_start + timedelta(days=i)
-                date_str = date.strftime('%Y-%m-%d')
-
-                checkin_file = os.path.join(checkin_dir, f'checkin_{date_str}.json')
-                if os.path.exists(checkin_file):
-                    with open(checkin_file, 'r', encoding='utf-8') as f:
-                        week_data[date_str] = json.load(f)
-
-        return jsonify({
-            'success': True,
-            'weekData': week_data
-        })
+        # Serialized once per version of the week's check-ins
+        return Response(load_week_checkins_json(patient_id, week), mimetype='application/json')
 
     except Exception as e:
         return jsonify({
@@ -483,26 +706,29 @@ def get_week_data(patient_id, week):
 @app.route('/api/therapy/get-all-patients', methods=['GET'])
 @require_auth  # Using mock_auth instead of require_auth for development
 def get_all_therapy_patients():
-    """Get list of all enrolled therapy patients for this therapist"""
+    """Get list of all enrolled therapy patients for this therapist (paged with ?offset=&limit=)"""
     try:
-        patients = []
-        patients_dir = os.path.join('therapy_data', 'patients')
+        # Only show patients enrolled by this therapist
+        patients = get_patients_for_therapist(request.therapist['email'])
 
-        if os.path.exists(patients_dir):
-            for filename in os.listdir(patients_dir):
-                if filename.startswith('patient_') and filename.endswith('.json'):
-                    filepath = os.path.join(patients_dir, filename)
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        patient_data = json.load(f)
+        offset = request.args.get('offset', type=int)
+        limit = request.args.get('limit', type=int)
+        if offset is None and limit is None:
+            return jsonify({
+                'success': True,
+                'patients': patients
+            })
 
-                        # Only show patients enrolled by this therapist
-                        if (patient_data.get('enrolledBy') == request.therapist['email'] or
-                                request.therapist['email'] == 'admin@system'):
-                            patients.append(patient_data)
+        # Pages follow patient ID order so they stay stable across workers and restarts
+        offset = max(offset or 0, 0)
+        patients.sort(key=lambda patient: str(patient.get('patientId', '')))
+        page = patients[offset:offset + max(limit, 0)] if limit is not None else patients[offset:]
 
         return jsonify({
             'success': True,
-            'patients': patients
+            'patients': page,
+            'total': len(patients),
+            'offset': offset
         })
 
     except Exception as e:
@@ -519,277 +745,19 @@ def generate_excel_report(patient_id, week):
     """Generate comprehensive Excel report for a patient's week"""
     try:
         # Get patient data and verify authorization
-        patient_file = os.path.join('therapy_data', 'patients', f'patient_{patient_id}.json')
-        if not os.path.exists(patient_file):
+        patient_data = get_patient(patient_id)
+        if patient_data is None:
             return jsonify({'success': False, 'error': 'Patient not found'}), 404
 
-        with open(patient_file, 'r', encoding='utf-8') as f:
-            patient_data = json.load(f)
-
         if patient_data.get('enrolledBy') != request.therapist['email'] and request.therapist[
             'email'] != 'admin@system':
             return jsonify({'success': False, 'error': 'Unauthorized access'}), 403
 
-        # Get week data
-        week_response = get_week_data(patient_id, week)
-        week_data_json = week_response.get_json()
-        week_data = week_data_json.get('weekData', {})
-
-        # Create Excel workbook
-        wb = openpyxl.Workbook()
-
-        # Create Summary Sheet
-        summary_sheet = wb.active
-        summary_sheet.title = "Weekly Summary"
-
-        # Styles
-        header_font = Font(bold=True, size=14)
-        subheader_font = Font(bold=True, size=12)
-
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        subheader_fill = PatternFill(start_color="DCE6F1", end_color="DCE6F1", fill_type="solid")
-
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-
-        # Add patient information
-        summary_sheet['A1'] = "WEEKLY THERAPY TRACKING REPORT"
-        summary_sheet['A1'].font = Font(bold=True, size=16)
-        summary_sheet.merge_cells('A1:F1')
-
-        summary_sheet['A3'] = "Patient Information"
-        summary_sheet['A3'].font = subheader_font
-        summary_sheet.merge_cells('A3:B3')
-
-        patient_info_rows = [
-            ("Patient ID:", patient_data['patientId']),
-            ("Patient Name:", patient_data['name']),
-            ("Therapist:", patient_data['therapistName']),
-            ("Therapist Email:", patient_data['therapistEmail']),
-            ("Week:", week),
-            ("Report Generated:", datetime.now().strftime("%Y-%m-%d %H:%M"))
-        ]
-
-        row = 4
-        for label, value in patient_info_rows:
-            summary_sheet[f'A{row}'] = label
-            summary_sheet[f'B{row}'] = value
-            summary_sheet[f'A{row}'].font = Font(bold=True)
-            row += 1
-
-        # Add summary statistics
-        summary_sheet['D3'] = "Weekly Statistics"
-        summary_sheet['D3'].font = subheader_font
-        summary_sheet.merge_cells('D3:F3')
-
-        # Calculate statistics
-        total_days = 7
-        completed_days = len(week_data)
-
-        if completed_days > 0:
-            total_emotional = sum(data['emotional']['value'] for data in week_data.values())
-            total_medication = sum(data['medication']['value'] for data in week_data.values())
-            total_activity = sum(data['activity']['value'] for data in week_data.values())
-
-            avg_emotional = total_emotional / completed_days
-            avg_medication = total_medication / completed_days
-            avg_activity = total_activity / completed_days
-        else:
-            avg_emotional = avg_medication = avg_activity = 0
-
-        stats_rows = [
-            ("Completion Rate:", f"{completed_days}/{total_days} ({completed_days / 7 * 100:.1f}%)"),
-            ("Avg Emotional State:", f"{avg_emotional:.2f}/5" if completed_days > 0 else "N/A"),
-            ("Avg Medication Adherence:", f"{avg_medication:.2f}/5" if completed_days > 0 else "N/A"),
-            ("Avg Physical Activity:", f"{avg_activity:.2f}/5" if completed_days > 0 else "N/A")
-        ]
-
-        row = 4
-        for label, value in stats_rows:
-            summary_sheet[f'D{row}'] = label
-            summary_sheet[f'E{row}'] = value
-            summary_sheet[f'D{row}'].font = Font(bold=True)
-            row += 1
-
-        # Create Daily Data Sheet
-        daily_sheet = wb.create_sheet("Daily Check-ins")
-
-        # Headers for daily data
-        headers = ["Date", "Day", "Time", "Emotional State", "Emotional Notes",
-                   "Medication Adherence", "Medication Notes", "Physical Activity",
-                   "Activity Notes", "Check-in Status"]
-
-        for col, header in enumerate(headers, 1):
-            cell = daily_sheet.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center')
-            cell.border = border
-
-        # Parse week to get dates
-        year, week_num = week.split('-W')
-        year = int(year)
-        week_num = int(week_num)
-
-        # Calculate week start date
-        jan_4 = datetime(year, 1, 4)
-        week_1_monday = jan_4 - timedelta(days=jan_4.weekday())
-        week_start = week_1_monday + timedelta(weeks=week_num - 1)
-
-        # Add daily data
-        days_of_week = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-
-        for day_num in range(7):
-            current_date = week_start + timedelta(days=day_num)
-            date_str = current_date.strftime('%Y-%m-%d')
-
-            row = day_num + 2
-            daily_sheet.cell(row=row, column=1, value=date_str).border = border
-            daily_sheet.cell(row=row, column=2, value=days_of_week[day_num]).border = border
-
-            if date_str in week_data:
-                data = week_data[date_str]
-                daily_sheet.cell(row=row, column=3, value=data.get('time', '')).border = border
-                daily_sheet.cell(row=row, column=4, value=data['emotional']['value']).border = border
-                daily_sheet.cell(row=row, column=5, value=data['emotional'].get('notes', '')).border = border
-
-                # Medication value with text labels
-                med_value = data['medication']['value']
-                medication_text = {
-                    0: "Not Applicable",
-                    1: "No Doses",
-                    3: "Partial Doses",
-                    5: "Yes, All Doses"
-                }.get(med_value, str(med_value))
-                daily_sheet.cell(row=row, column=6, value=medication_text).border = border
-                daily_sheet.cell(row=row, column=7, value=data['medication'].get('notes', '')).border = border
-                daily_sheet.cell(row=row, column=8, value=data['activity']['value']).border = border
-                daily_sheet.cell(row=row, column=9, value=data['activity'].get('notes', '')).border = border
-                daily_sheet.cell(row=row, column=10, value="Completed").border = border
-
-                # Color code emotional state
-                emotional_cell = daily_sheet.cell(row=row, column=4)
-                emotional_value = emotional_cell.value
-                if emotional_value >= 4:
-                    emotional_cell.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-                elif emotional_value == 3:
-                    emotional_cell.fill = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
-                else:
-                    emotional_cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-
-                # Color code medication adherence
-                medication_cell = daily_sheet.cell(row=row, column=6)
-                if med_value == 0:  # Not Applicable - no color
-                    pass
-                elif med_value == 1:  # No Doses - red
-                    medication_cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-                elif med_value == 3:  # Partial Doses - yellow
-                    medication_cell.fill = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
-                elif med_value == 5:  # Yes, All Doses - green
-                    medication_cell.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-
-                # Color code physical activity
-                activity_cell = daily_sheet.cell(row=row, column=8)
-                activity_value = activity_cell.value
-                if activity_value >= 4:
-                    activity_cell.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-                elif activity_value == 3:
-                    activity_cell.fill = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
-                else:
-                    activity_cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-            else:
-                daily_sheet.cell(row=row, column=3, value="-").border = border
-                for col in range(4, 10):
-                    daily_sheet.cell(row=row, column=col, value="-").border = border
-                cell = daily_sheet.cell(row=row, column=10, value="No Response")
-                cell.border = border
-                cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-
-        # Create Detailed Notes Sheet
-        notes_sheet = wb.create_sheet("Detailed Notes")
-
-        # Headers for notes
-        notes_headers = ["Date", "Category", "Rating", "Notes"]
-        for col, header in enumerate(notes_headers, 1):
-            cell = notes_sheet.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center')
-            cell.border = border
-
-        # Add all notes
-        row = 2
-        for date_str in sorted(week_data.keys()):
-            data = week_data[date_str]
-
-            # Emotional notes
-            if data['emotional'].get('notes'):
-                notes_sheet.cell(row=row, column=1, value=date_str).border = border
-                notes_sheet.cell(row=row, column=2, value="Emotional").border = border
-                notes_sheet.cell(row=row, column=3, value=data['emotional']['value']).border = border
-                notes_sheet.cell(row=row, column=4, value=data['emotional']['notes']).border = border
-                row += 1
-
-            # Medication notes
-            if data['medication'].get('notes'):
-                notes_sheet.cell(row=row, column=1, value=date_str).border = border
-                notes_sheet.cell(row=row, column=2, value="Medication").border = border
-                med_value = data['medication']['value']
-                medication_text = {
-                    0: "Not Applicable",
-                    1: "No Doses",
-                    3: "Partial Doses",
-                    5: "Yes, All Doses"
-                }.get(med_value, str(med_value))
-                notes_sheet.cell(row=row, column=3, value=medication_text).border = border
-                notes_sheet.cell(row=row, column=4, value=data['medication']['notes']).border = border
-                row += 1
-
-            # Activity notes
-            if data['activity'].get('notes'):
-                notes_sheet.cell(row=row, column=1, value=date_str).border = border
-                notes_sheet.cell(row=row, column=2, value="Physical Activity").border = border
-                notes_sheet.cell(row=row, column=3, value=data['activity']['value']).border = border
-                notes_sheet.cell(row=row, column=4, value=data['activity']['notes']).border = border
-                row += 1
-
-        # Auto-adjust column widths
-        for sheet in [summary_sheet, daily_sheet, notes_sheet]:
-            for column in sheet.columns:
-                max_length = 0
-                column_letter = get_column_letter(column[0].column)
-
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-
-                adjusted_width = min(max_length + 2, 50)
-                sheet.column_dimensions[column_letter].width = adjusted_width
-
-        # Save Excel file
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"therapy_report_{patient_id}_{week}_{timestamp}.xlsx"
-        filepath = os.path.join('therapy_data', 'excel_exports', filename)
-
-        wb.save(filepath)
+        _, filename, output = build_excel_report(patient_id, week, patient_data)
 
-        # Log activity
-        log_activity('report_generated', {
-            'patient_id': patient_id,
-            'week': week,
-            'therapist': request.therapist['email']
-        })
-
-        # Return file as download
+        # Return the in-memory report as download instead of reading the copy back from disk
         return send_file(
-            filepath,
+            output,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
             download_name=filename
@@ -808,21 +776,16 @@ def generate_excel_report(patient_id, week):
 def email_therapy_report():
     """Generate Excel report and send via email using system email account"""
     try:
-        print(f"DEBUG: SYSTEM_EMAIL env var: {os.environ.get('SYSTEM_EMAIL')}")
-        print(f"DEBUG: SYSTEM_EMAIL_PASSWORD env var: {os.environ.get('SYSTEM_EMAIL_PASSWORD')}")
         data = request.json
         patient_id = data.get('patientId')
         week = data.get('week')
         custom_recipient = data.get('customRecipient')  # Optional custom recipient
 
         # Get patient data and verify authorization
-        patient_file = os.path.join('therapy_data', 'patients', f'patient_{patient_id}.json')
-        if not os.path.exists(patient_file):
+        patient_data = get_patient(patient_id)
+        if patient_data is None:
             return jsonify({'success': False, 'error': 'Patient not found'}), 404
 
-        with open(patient_file, 'r', encoding='utf-8') as f:
-            patient_data = json.load(f)
-
         if patient_data.get('enrolledBy') != request.therapist['email'] and request.therapist[
             'email'] != 'admin@system':
             return jsonify({'success': False, 'error': 'Unauthorized access'}), 403
@@ -830,196 +793,180 @@ def email_therapy_report():
         # Determine recipient
         recipient_email = custom_recipient if custom_recipient else patient_data['therapistEmail']
 
-        # First, generate the Excel report
-        excel_response = generate_excel_report(patient_id, week)
-
-        if not isinstance(excel_response, Response):
-            return jsonify({'success': False, 'error': 'Failed to generate Excel report'}), 500
-
-        # Get week data for email content
-        week_response = get_week_data(patient_id, week)
-        week_data_json = week_response.get_json()
-        week_data = week_data_json.get('weekData', {})
+        if data.get('background'):
+            # Build and send after responding; poll /api/therapy/job-status/<jobId> for the result
+            job_id = submit_job(copy_current_request_context(deliver_therapy_report),
+                                patient_id, week, patient_data, recipient_email)
+            return jsonify({'success': True, 'jobId': job_id, 'status': 'running'}), 202
 
-        # Calculate summary
-        completed_days = len(week_data)
-        if completed_days > 0:
-            avg_emotional = sum(d['emotional']['value'] for d in week_data.values()) / completed_days
+        response_data, status = deliver_therapy_report(patient_id, week, patient_data, recipient_email)
+        return jsonify(response_data), status
 
-            # Handle medication values properly
-            med_values = []
-            for d in week_data.values():
-                med_val = d['medication']['value']
-                if med_val > 0:  # Exclude "Not Applicable"
-                    med_values.append(med_val)
-
-            avg_medication = sum(med_values) / len(med_values) if med_values else 0
-            avg_activity = sum(d['activity']['value'] for d in week_data.values()) / completed_days
-        else:
-            avg_emotional = avg_medication = avg_activity = 0
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
-        # Find the Excel file
-        excel_files = []
-        excel_dir = os.path.join('therapy_data', 'excel_exports')
-        if os.path.exists(excel_dir):
-            for filename in os.listdir(excel_dir):
-                if filename.startswith(f"therapy_report_{patient_id}_{week}_"):
-                    excel_files.append(os.path.join(excel_dir, filename))
 
-        if not excel_files:
+@app.route('/api/therapy/email-report-batch', methods=['POST'])
+@require_auth
+@limiter.limit("5 per hour")
+def email_therapy_report_batch():
+    """Email several weekly reports over one SMTP session"""
+    try:
+        data = request.json
+        reports = data.get('reports')
+        if not reports or not isinstance(reports, list):
+            return jsonify({'success': False, 'error': 'Missing reports'}), 400
+        if len(reports) > MAX_BATCH_REPORTS:
+            return jsonify({'success': False, 'error': f'At most {MAX_BATCH_REPORTS} reports per batch'}), 400
+
+        system_email_config = get_system_email_config()
+        if not system_email_config:
             return jsonify({
                 'success': False,
-                'error': 'No Excel report found. Please generate one first.'
-            }), 404
-
-        excel_filepath = max(excel_files, key=os.path.getctime)
-        excel_filename = os.path.basename(excel_filepath)
+                'error': 'Email not sent - system email not configured. Contact administrator.'
+            }), 400
 
-        # Prepare email content
         system_name = os.environ.get('SYSTEM_NAME', 'Therapeutic Companion System')
-        email_content = f"""
-Dear {patient_data['therapistName']},
+        results = []
+        outbox = []  # (result, message) pairs ready to send
+
+        # Build every message first so the SMTP session only carries sends
+        for item in reports:
+            patient_id = item.get('patientId')
+            week = item.get('week')
+            result = {'patientId': patient_id, 'week': week, 'sent': False}
+            results.append(result)
+
+            patient_data = get_patient(patient_id)
+            if patient_data is None:
+                result['error'] = 'Patient not found'
+                continue
+            if patient_data.get('enrolledBy') != request.therapist['email'] and request.therapist[
+                'email'] != 'admin@system':
+                result['error'] = 'Unauthorized access'
+                continue
 
-This is the weekly therapy tracking report for {patient_data['name']} (ID: {patient_id}).
+            try:
+                _, excel_filename, excel_output = build_excel_report(patient_id, week, patient_data)
+            except Exception as e:
+                result['error'] = f'Failed to generate Excel report: {str(e)}'
+                continue
+
+            recipient_email = item.get('recipient') or patient_data['therapistEmail']
+            subject = f'Weekly Therapy Report - {patient_data["name"]} - Week {week}'
+            result['recipient'] = recipient_email
+            outbox.append((result, build_report_message(
+                system_email_config, system_name, recipient_email, subject,
+                build_report_email_content(patient_id, week, patient_data, system_name),
+                excel_filename, excel_output.getvalue(), reply_to=request.therapist['email']
+            )))
+
+        send_batch(system_email_config, outbox)
+
+        for result in results:
+            if result['sent']:
+                log_activity('email_sent', {
+                    'patient_id': result['patientId'],
+                    'recipient': result['recipient'],
+                    'week': result['week'],
+                    'therapist': request.therapist['email']
+                })
 
-Week: {week}
-Completion Rate: {completed_days}/7 days ({completed_days / 7 * 100:.1f}%)
+        return jsonify({
+            'success': True,
+            'sent': sum(1 for result in results if result['sent']),
+            'results': results
+        })
 
-Summary Statistics:
-- Average Emotional State: {avg_emotional:.2f}/5
-- Average Medication Adherence: {avg_medication:.2f}/5 {"(excluding N/A)" if avg_medication > 0 else ""}
-- Average Physical Activity: {avg_activity:.2f}/5
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
-Please find the detailed Excel report attached.
 
-Best regards,
-{system_name}
+@app.route('/api/therapy/generate-all-reports', methods=['POST'])
+@require_auth
+@limiter.limit("2 per hour")
+def generate_all_reports():
+    """Build one week's Excel report for every patient of this therapist on the background job threads"""
+    try:
+        data = request.json or {}
+        week = data.get('week')
+        if not week:
+            return jsonify({'success': False, 'error': 'Missing week'}), 400
+        get_week_dates(week)  # Reject malformed weeks before starting any work
+
+        results = []
+        pending = {}  # Future -> (result, report version)
+        for patient_data in get_patients_for_therapist(request.therapist['email']):
+            patient_id = patient_data['patientId']
+            result = {'patientId': patient_id}
+            results.append(result)
+
+            week_entry, version, cached = find_cached_report(patient_id, week)
+            if cached is not None:
+                result['filename'] = cached[1]
+                result['cached'] = True
+                continue
+
+            week_data = week_entry[1] if week_entry is not None else {}
+            future = _JOB_EXECUTOR.submit(write_excel_report, patient_id, week, patient_data, week_data)
+            pending[future] = (result, version)
+
+        for future in as_completed(pending):
+            result, version = pending[future]
+            try:
+                filepath, filename, report = future.result()
+            except Exception as e:
+                result['error'] = f'Failed to generate Excel report: {str(e)}'
+                continue
+            store_report(result['patientId'], week, version, filepath, filename, report)
+            result['filename'] = filename
 
----
-This is an automated report. Please do not reply to this email.
-Generated by: {request.therapist['name']} ({request.therapist['email']})
-Organization: {request.therapist.get('organization', 'N/A')}
-        """
+        log_activity('reports_generated', {
+            'week': week,
+            'count': len(pending),
+            'therapist': request.therapist['email']
+        })
 
-        # Try to send email
-        email_sent = False
-        error_message = None
+        return jsonify({
+            'success': True,
+            'week': week,
+            'generated': sum(1 for result, _ in pending.values() if 'filename' in result),
+            'reports': results
+        })
 
-        # Check for SendGrid first
-        if SENDGRID_AVAILABLE and os.environ.get('SENDGRID_API_KEY'):
-            try:
-                email_sent = send_email_via_sendgrid(
-                    recipient_email,
-                    f'Weekly Therapy Report - {patient_data["name"]} - Week {week}',
-                    email_content,
-                    excel_filepath,
-                    reply_to=request.therapist['email']
-                )
-            except Exception as e:
-                error_message = str(e)
-
-        # Fall back to SMTP
-        if not email_sent:
-            system_email_config = get_system_email_config()
-
-            if system_email_config:
-                print(f"DEBUG: SYSTEM_EMAIL env var: {os.environ.get('SYSTEM_EMAIL')}")
-                print(f"DEBUG: SYSTEM_EMAIL_PASSWORD env var: {os.environ.get('SYSTEM_EMAIL_PASSWORD')}")
-                try:
-                    # Create message
-                    msg = MIMEMultipart()
-                    msg['From'] = f"{system_name} <{system_email_config['sender_email']}>"
-                    msg['To'] = recipient_email
-                    msg['Subject'] = f'Weekly Therapy Report - {patient_data["name"]} - Week {week}'
-                    msg['Reply-To'] = request.therapist['email']
-
-                    # Add body
-                    msg.attach(MIMEText(email_content, 'plain'))
-
-                    # Add Excel attachment
-                    with open(excel_filepath, 'rb') as attachment:
-                        part = MIMEBase('application', 'octet-stream')
-                        part.set_payload(attachment.read())
-                        encoders.encode_base64(part)
-                        part.add_header(
-                            'Content-Disposition',
-                            f'attachment; filename= {excel_filename}'
-                        )
-                        msg.attach(part)
-
-                    # Send email with better error handling
-                    print(f"Attempting to send email from {system_email_config['sender_email']} to {recipient_email}")
-                    server = smtplib.SMTP(system_email_config['smtp_server'], system_email_config['smtp_port'])
-                    server.set_debuglevel(1)  # Enable debug output
-                    server.starttls()
-                    server.login(system_email_config['sender_email'], system_email_config['sender_password'])
-                    server.send_message(msg)
-                    server.quit()
-
-                    email_sent = True
-                    print("Email sent successfully!")
-
-                except smtplib.SMTPAuthenticationError as e:
-                    error_message = f"Authentication failed: {str(e)}. Please check your email and app password."
-                    print(f"SMTP Auth Error: {error_message}")
-                except smtplib.SMTPException as e:
-                    error_message = f"SMTP error: {str(e)}"
-                    print(f"SMTP Error: {error_message}")
-                except Exception as e:
-                    error_message = f"General error: {str(e)}"
-                    print(f"General Error: {error_message}")
-
-        if email_sent:
-            # Log email sent
-            log_activity('email_sent', {
-                'patient_id': patient_id,
-                'recipient': recipient_email,
-                'week': week,
-                'therapist': request.therapist['email']
-            })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
-            return jsonify({
-                'success': True,
-                'message': 'Email sent successfully',
-                'recipient': recipient_email,
-                'subject': f'Weekly Therapy Report - {patient_data["name"]} - Week {week}',
-                'note': 'Email sent with Excel attachment'
-            })
-        else:
-            # Email not sent - provide preview with actual error
-            response_data = {
-                'success': True,
-                'message': 'Email report prepared',
-                'recipient': recipient_email,
-                'subject': f'Weekly Therapy Report - {patient_data["name"]} - Week {week}',
-                'content': email_content,
-                'attachment': excel_filename,
-                'attachment_path': excel_filepath
-            }
 
-            if system_email_config:
-                # Configuration exists but email failed
-                response_data['note'] = f'Email configuration found but sending failed: {error_message}'
-                response_data['troubleshooting'] = [
-                    'Verify your Gmail App Password is correct',
-                    'Ensure 2-Factor Authentication is enabled on your Gmail account',
-                    'Check that the app password has not expired',
-                    'Try generating a new App Password at https://myaccount.google.com/apppasswords'
-                ]
-            else:
-                # No configuration found
-                response_data['note'] = 'Email not sent - system email not configured. Contact administrator.'
-                response_data['config_example'] = {
-                    'sender_email': 'your-email@gmail.com',
-                    'sender_password': 'your-app-password',
-                    'smtp_server': 'smtp.gmail.com',
-                    'smtp_port': 587
-                }
+@app.route('/api/therapy/job-status/<job_id>', methods=['GET'])
+@require_auth
+def get_job_status(job_id):
+    """Report whether a background email job is still running and its result once done"""
+    try:
+        job = get_job(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+
+        if job['therapist'] != request.therapist['email'] and request.therapist['email'] != 'admin@system':
+            return jsonify({'success': False, 'error': 'Unauthorized access'}), 403
 
-            if error_message:
-                response_data['error'] = error_message
+        if job['status'] == 'running':
+            return jsonify({'success': True, 'jobId': job_id, 'status': 'running'})
 
-            return jsonify(response_data)
+        if job['status'] == 'error':
+            return jsonify({'success': True, 'jobId': job_id, 'status': 'error', 'error': job['error']})
+
+        return jsonify({'success': True, 'jobId': job_id, 'status': 'done',
+                        'httpStatus': job['httpStatus'], 'result': job['result']})
 
     except Exception as e:
         return jsonify({
@@ -1030,6 +977,585 @@ Organization: {request.therapist.get('organization', 'N/A')}
 
 # ============= HELPER FUNCTIONS =============
 
+def deliver_therapy_report(patient_id, week, patient_data, recipient_email):
+    """Build a patient's weekly report and email it; returns (response data, HTTP status)"""
+    # First, generate the Excel report
+    try:
+        excel_filepath, excel_filename, excel_output = build_excel_report(patient_id, week, patient_data)
+    except Exception as e:
+        return {'success': False, 'error': f'Failed to generate Excel report: {str(e)}'}, 500
+    excel_data = excel_output.getvalue()
+
+    # Prepare email content
+    system_name = os.environ.get('SYSTEM_NAME', 'Therapeutic Companion System')
+    email_content = build_report_email_content(patient_id, week, patient_data, system_name)
+    subject = f'Weekly Therapy Report - {patient_data["name"]} - Week {week}'
+
+    # Try to send email
+    email_sent = False
+    error_message = None
+
+    # Check for SendGrid first
+    if SENDGRID_AVAILABLE and os.environ.get('SENDGRID_API_KEY'):
+        try:
+            email_sent = send_email_via_sendgrid(
+                recipient_email,
+                subject,
+                email_content,
+                excel_filename,
+                excel_data,
+                reply_to=request.therapist['email']
+            )
+        except Exception as e:
+            error_message = str(e)
+
+    # Fall back to SMTP
+    if not email_sent:
+        system_email_config = get_system_email_config()
+
+        if system_email_config:
+            try:
+                msg = build_report_message(system_email_config, system_name, recipient_email, subject,
+                                           email_content, excel_filename, excel_data,
+                                           reply_to=request.therapist['email'])
+
+                # Send email with better error handling
+                app.logger.debug('Sending email from %s to %s', system_email_config['sender_email'], recipient_email)
+                with _SMTP_POOL.acquire(system_email_config) as server:
+                    server.send_message(msg)
+
+                email_sent = True
+                app.logger.debug('Email sent to %s', recipient_email)
+
+            except smtplib.SMTPAuthenticationError as e:
+                error_message = f"Authentication failed: {str(e)}. Please check your email and app password."
+                print(f"SMTP Auth Error: {error_message}")
+            except smtplib.SMTPException as e:
+                error_message = f"SMTP error: {str(e)}"
+                print(f"SMTP Error: {error_message}")
+            except Exception as e:
+                error_message = f"General error: {str(e)}"
+                print(f"General Error: {error_message}")
+
+    if email_sent:
+        # Log email sent
+        log_activity('email_sent', {
+            'patient_id': patient_id,
+            'recipient': recipient_email,
+            'week': week,
+            'therapist': request.therapist['email']
+        })
+
+        return {
+            'success': True,
+            'message': 'Email sent successfully',
+            'recipient': recipient_email,
+            'subject': subject,
+            'note': 'Email sent with Excel attachment'
+        }, 200
+    else:
+        # Email not sent - provide preview with actual error
+        response_data = {
+            'success': True,
+            'message': 'Email report prepared',
+            'recipient': recipient_email,
+            'subject': subject,
+            'content': email_content,
+            'attachment': excel_filename,
+            'attachment_path': excel_filepath
+        }
+
+        if system_email_config:
+            # Configuration exists but email failed
+            response_data['note'] = f'Email configuration found but sending failed: {error_message}'
+            response_data['troubleshooting'] = [
+                'Verify your Gmail App Password is correct',
+                'Ensure 2-Factor Authentication is enabled on your Gmail account',
+                'Check that the app password has not expired',
+                'Try generating a new App Password at https://myaccount.google.com/apppasswords'
+            ]
+        else:
+            # No configuration found
+            response_data['note'] = 'Email not sent - system email not configured. Contact administrator.'
+            response_data['config_example'] = {
+                'sender_email': 'your-email@gmail.com',
+                'sender_password': 'your-app-password',
+                'smtp_server': 'smtp.gmail.com',
+                'smtp_port': 587
+            }
+
+        if error_message:
+            response_data['error'] = error_message
+
+        return response_data, 200
+
+
+# Medication adherence values with their text labels
+MEDICATION_TEXT = {
+    0: "Not Applicable",
+    1: "No Doses",
+    3: "Partial Doses",
+    5: "Yes, All Doses"
+}
+
+DAYS_OF_WEEK = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+def summarize_week(week_data):
+    """Weekly averages from one pass over the check-ins (0 when there is nothing to average)"""
+    completed_days = len(week_data)
+    total_emotional = total_medication = total_activity = medication_taken = medication_days = 0
+    for d in week_data.values():
+        total_emotional += d['emotional']['value']
+        total_activity += d['activity']['value']
+
+        med_val = d['medication']['value']
+        total_medication += med_val
+        if med_val > 0:  # Exclude "Not Applicable"
+            medication_taken += med_val
+            medication_days += 1
+
+    return {
+        'completed_days': completed_days,
+        'avg_emotional': total_emotional / completed_days if completed_days else 0,
+        'avg_medication': total_medication / completed_days if completed_days else 0,
+        'avg_medication_applicable': medication_taken / medication_days if medication_days else 0,
+        'avg_activity': total_activity / completed_days if completed_days else 0
+    }
+
+
+# (patient_id, week) -> (check-in and patient file versions, saved file path, file name, report bytes)
+_REPORT_CACHE = OrderedDict()
+_REPORT_CACHE_LOCK = threading.Lock()
+_REPORT_CACHE_SIZE = 128
+
+
+def build_excel_report(patient_id, week, patient_data):
+    """Get a patient's weekly Excel report, reusing the last one if neither the week nor the patient changed
+
+    Returns (saved file path, file name, BytesIO positioned at the start of the report)
+    """
+    week_entry, version, cached = find_cached_report(patient_id, week)
+
+    if cached is not None:
+        filepath, filename, report = cached
+    else:
+        week_data = week_entry[1] if week_entry is not None else {}
+        filepath, filename, report = write_excel_report(patient_id, week, patient_data, week_data)
+        store_report(patient_id, week, version, filepath, filename, report)
+
+    # Log activity
+    log_activity('report_generated', {
+        'patient_id': patient_id,
+        'week': week,
+        'therapist': request.therapist['email']
+    })
+
+    return filepath, filename, io.BytesIO(report)
+
+
+def find_cached_report(patient_id, week):
+    """Look up a still-current cached report
+
+    Returns (week cache entry, report version, (file path, file name, bytes) or None)
+    """
+    week_entry = load_week_cache_entry(patient_id, week)
+    version = (week_entry[0] if week_entry is not None else None, _PATIENT_FILE_MTIMES.get(patient_id))
+    key = (patient_id, week)
+
+    with _REPORT_CACHE_LOCK:
+        cached = _REPORT_CACHE.get(key)
+        if cached is not None and cached[0] == version:
+            _REPORT_CACHE.move_to_end(key)
+
+    if cached is not None and cached[0] == version and os.path.exists(cached[1]):
+        return week_entry, version, cached[1:]
+    return week_entry, version, None
+
+
+def store_report(patient_id, week, version, filepath, filename, report):
+    """Remember a freshly written report for reuse while its version stays current"""
+    key = (patient_id, week)
+    with _REPORT_CACHE_LOCK:
+        _REPORT_CACHE[key] = (version, filepath, filename, report)
+        _REPORT_CACHE.move_to_end(key)
+        while len(_REPORT_CACHE) > _REPORT_CACHE_SIZE:
+            _REPORT_CACHE.popitem(last=False)
+
+
+def write_excel_report(patient_id, week, patient_data, week_data):
+    """Build a weekly Excel report and save a copy in excel_exports; returns (file path, file name, bytes)"""
+    # Create Excel workbook in memory, writing every sheet row by row
+    output = io.BytesIO()
+    # Text is never turned into formulas or links, so rows can go through write_row
+    wb = xlsxwriter.Workbook(output, {
+        'in_memory': True,
+        'strings_to_formulas': False,
+        'strings_to_urls': False
+    })
+
+    # Styles (created once and shared by every cell)
+    title_fmt = wb.add_format({'bold': True, 'font_size': 16})
+    subheader_fmt = wb.add_format({'bold': True, 'font_size': 12})
+    bold_fmt = wb.add_format({'bold': True})
+    header_fmt = wb.add_format({
+        'bold': True, 'font_color': '#FFFFFF', 'bg_color': '#366092',
+        'align': 'center', 'border': 1
+    })
+    border_fmt = wb.add_format({'border': 1})
+    green_fmt = wb.add_format({'border': 1, 'bg_color': '#C6EFCE'})
+    yellow_fmt = wb.add_format({'border': 1, 'bg_color': '#FFEB9C'})
+    red_fmt = wb.add_format({'border': 1, 'bg_color': '#FFC7CE'})
+
+    def score_format(value):
+        """Green for 4-5, yellow for 3, red otherwise"""
+        if value >= 4:
+            return green_fmt
+        elif value == 3:
+            return yellow_fmt
+        return red_fmt
+
+    medication_formats = {1: red_fmt, 3: yellow_fmt, 5: green_fmt}
+
+    # Create Summary Sheet
+    summary_sheet = wb.add_worksheet("Weekly Summary")
+    summary_widths = {}
+
+    # Add patient information
+    summary_sheet.merge_range(0, 0, 0, 5, "WEEKLY THERAPY TRACKING REPORT", title_fmt)
+    summary_widths[0] = len("WEEKLY THERAPY TRACKING REPORT")
+
+    summary_sheet.merge_range(2, 0, 2, 1, "Patient Information", subheader_fmt)
+    summary_sheet.merge_range(2, 3, 2, 5, "Weekly Statistics", subheader_fmt)
+
+    patient_info_rows = [
+        ("Patient ID:", patient_data['patientId']),
+        ("Patient Name:", patient_data['name']),
+        ("Therapist:", patient_data['therapistName']),
+        ("Therapist Email:", patient_data['therapistEmail']),
+        ("Week:", week),
+        ("Report Generated:", datetime.now().strftime("%Y-%m-%d %H:%M"))
+    ]
+
+    # Calculate statistics
+    total_days = 7
+    summary = summarize_week(week_data)
+    completed_days = summary['completed_days']
+
+    stats_rows = [
+        ("Completion Rate:", f"{completed_days}/{total_days} ({completed_days / 7 * 100:.1f}%)"),
+        ("Avg Emotional State:", f"{summary['avg_emotional']:.2f}/5" if completed_days > 0 else "N/A"),
+        ("Avg Medication Adherence:", f"{summary['avg_medication']:.2f}/5" if completed_days > 0 else "N/A"),
+        ("Avg Physical Activity:", f"{summary['avg_activity']:.2f}/5" if completed_days > 0 else "N/A")
+    ]
+
+    # Patient info (columns A-B) and statistics (columns D-E) share rows 4+
+    for offset in range(max(len(patient_info_rows), len(stats_rows))):
+        row = offset + 3
+        if offset < len(patient_info_rows):
+            label, value = patient_info_rows[offset]
+            write_report_cell(summary_sheet, summary_widths, row, 0, label, bold_fmt)
+            write_report_cell(summary_sheet, summary_widths, row, 1, value)
+        if offset < len(stats_rows):
+            label, value = stats_rows[offset]
+            write_report_cell(summary_sheet, summary_widths, row, 3, label, bold_fmt)
+            write_report_cell(summary_sheet, summary_widths, row, 4, value)
+
+    # Create Daily Data Sheet
+    daily_sheet = wb.add_worksheet("Daily Check-ins")
+    daily_widths = {}
+
+    # Headers for daily data
+    headers = ["Date", "Day", "Time", "Emotional State", "Emotional Notes",
+               "Medication Adherence", "Medication Notes", "Physical Activity",
+               "Activity Notes", "Check-in Status"]
+
+    write_report_row(daily_sheet, daily_widths, 0, headers, header_fmt)
+
+    # Add daily data
+    for day_num, date_str in enumerate(get_week_dates(week)):
+        row = day_num + 1
+
+        if date_str in week_data:
+            data = week_data[date_str]
+            emotional_value = data['emotional']['value']
+            med_value = data['medication']['value']
+            activity_value = data['activity']['value']
+
+            # Medication value with text labels
+            medication_text = MEDICATION_TEXT.get(med_value, str(med_value))
+
+            write_report_row(daily_sheet, daily_widths, row, [
+                date_str, DAYS_OF_WEEK[day_num], data.get('time', ''),
+                emotional_value, data['emotional'].get('notes', ''),
+                medication_text, data['medication'].get('notes', ''),
+                activity_value, data['activity'].get('notes', ''),
+                "Completed"
+            ], border_fmt)
+
+            # Color code emotional state, medication adherence and physical activity
+            daily_sheet.write(row, 3, emotional_value, score_format(emotional_value))
+            daily_sheet.write(row, 5, medication_text, medication_formats.get(med_value, border_fmt))
+            daily_sheet.write(row, 7, activity_value, score_format(activity_value))
+        else:
+            write_report_row(daily_sheet, daily_widths, row,
+                             [date_str, DAYS_OF_WEEK[day_num]] + ["-"] * 7, border_fmt)
+            write_report_cell(daily_sheet, daily_widths, row, 9, "No Response", red_fmt)
+
+    # Create Detailed Notes Sheet
+    notes_sheet = wb.add_worksheet("Detailed Notes")
+    notes_widths = {}
+
+    # Headers for notes
+    notes_headers = ["Date", "Category", "Rating", "Notes"]
+    write_report_row(notes_sheet, notes_widths, 0, notes_headers, header_fmt)
+
+    # Collect all notes, then write them row by row
+    notes_rows = []
+    for date_str in sorted(week_data.keys()):
+        data = week_data[date_str]
+
+        # Emotional notes
+        if data['emotional'].get('notes'):
+            notes_rows.append((date_str, "Emotional", data['emotional']['value'], data['emotional']['notes']))
+
+        # Medication notes
+        if data['medication'].get('notes'):
+            med_value = data['medication']['value']
+            medication_text = MEDICATION_TEXT.get(med_value, str(med_value))
+            notes_rows.append((date_str, "Medication", medication_text, data['medication']['notes']))
+
+        # Activity notes
+        if data['activity'].get('notes'):
+            notes_rows.append((date_str, "Physical Activity", data['activity']['value'], data['activity']['notes']))
+
+    for row, values in enumerate(notes_rows, start=1):
+        write_report_row(notes_sheet, notes_widths, row, values, border_fmt)
+
+    # Size columns from the widest value written to each
+    for sheet, widths in ((summary_sheet, summary_widths), (daily_sheet, daily_widths),
+                          (notes_sheet, notes_widths)):
+        set_report_column_widths(sheet, widths)
+
+    wb.close()
+
+    # Keep a copy of the report (used by the email endpoint and system stats)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"therapy_report_{patient_id}_{week}_{timestamp}.xlsx"
+    filepath = os.path.join('therapy_data', 'excel_exports', filename)
+
+    with open(filepath, 'wb') as f:
+        f.write(output.getbuffer())
+    update_counter('reports_generated')
+
+    return filepath, filename, output.getvalue()
+
+
+def write_report_cell(sheet, widths, row, col, value, cell_format=None):
+    """Write one Excel cell and track the widest value seen in its column"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        sheet.write_number(row, col, value, cell_format)
+    else:
+        value = '' if value is None else str(value)
+        sheet.write_string(row, col, value, cell_format)  # Never interpreted as a formula
+
+    widths[col] = max(widths.get(col, 0), len(str(value)))
+
+
+def write_report_row(sheet, widths, row, values, cell_format=None):
+    """Write a whole Excel row in one call and track the widest value in each column"""
+    sheet.write_row(row, 0, values, cell_format)
+
+    for col, value in enumerate(values):
+        widths[col] = max(widths.get(col, 0), len('' if value is None else str(value)))
+
+
+def set_report_column_widths(sheet, widths):
+    """Apply auto-fit column widths collected by write_report_cell"""
+    for col, max_length in widths.items():
+        sheet.set_column(col, col, min(max_length + 2, 50))
+
+
+@lru_cache(maxsize=128)
+def get_week_dates(week):
+    """Return the seven YYYY-MM-DD dates (Monday first) of an ISO week like 2024-W05"""
+    year, week_num = week.split('-W')
+    week_start = date.fromisocalendar(int(year), int(week_num), 1)
+    return tuple((week_start + timedelta(days=i)).isoformat() for i in range(7))
+
+
+def week_checkin_filename(date_str):
+    """Name of the file holding the check-ins of the ISO week a date falls in"""
+    iso_year, iso_week = date.fromisoformat(date_str).isocalendar()[:2]
+    return f'week_{iso_year}-W{iso_week:02d}.json'
+
+
+_CHECKIN_WRITE_LOCK = threading.Lock()
+
+
+@contextmanager
+def checkin_write_lock(patient_dir):
+    """Hold a patient's check-in write lock across threads and, with fcntl, across worker processes"""
+    with _CHECKIN_WRITE_LOCK:
+        try:
+            lock_file = open(os.path.join(patient_dir, '.lock'), 'ab')
+        except FileNotFoundError:
+            # Another worker deleted the patient's check-ins since this one created the directory
+            forget_dir(patient_dir)
+            ensure_dir(patient_dir)
+            lock_file = open(os.path.join(patient_dir, '.lock'), 'ab')
+
+        with lock_file:
+            if FCNTL_AVAILABLE:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)  # Released when the file is closed
+            yield
+
+
+def save_week_checkin(patient_dir, checkin_data):
+    """Store a day's check-in in its week file (date -> check-in), replacing the file atomically"""
+    date_str = checkin_data['date']
+    filename = week_checkin_filename(date_str)
+    filepath = os.path.join(patient_dir, filename)
+
+    legacy_file = os.path.join(patient_dir, f'checkin_{date_str}.json')
+
+    # The week file is read, changed and replaced, so writers of the same patient must take turns
+    with checkin_write_lock(patient_dir):
+        week_checkins = read_json_file(filepath) if os.path.exists(filepath) else {}
+        is_new_day = date_str not in week_checkins and not os.path.exists(legacy_file)
+        week_checkins[date_str] = checkin_data
+
+        try:
+            replace_json_file(filepath, week_checkins)
+        except FileNotFoundError:
+            # Another worker deleted the patient's check-ins since this one created the directory
+            forget_dir(patient_dir)
+            ensure_dir(patient_dir)
+            replace_json_file(filepath, week_checkins)
+
+        # Older versions kept one file per day; the week file now supersedes it
+        if os.path.exists(legacy_file):
+            os.remove(legacy_file)
+
+    if is_new_day:
+        update_counter('checkins')
+    return filename
+
+
+CHECKIN_READ_AHEAD = 8
+
+
+def iter_patient_checkins(patient_id):
+    """Yield (date, check-in) pairs of a patient, oldest first, holding one week in memory at a time"""
+    week_files = {}  # week file name -> path of the week file (None if only per-day files exist)
+    legacy_files = {}  # week file name -> {date: path of an older per-day file}
+    for entry in scan_files(os.path.join('therapy_data', 'checkins', patient_id)):
+        if entry.name.startswith('week_'):
+            week_files[entry.name] = entry.path
+        elif entry.name.startswith('checkin_'):
+            date_str = entry.name[len('checkin_'):-len('.json')]
+            week_name = week_checkin_filename(date_str)
+            week_files.setdefault(week_name, None)
+            legacy_files.setdefault(week_name, {})[date_str] = entry.path
+
+    def load_week(week_name):
+        week_checkins = {
+            date_str: read_json_file(path)
+            for date_str, path in legacy_files.get(week_name, {}).items()
+        }
+        if week_files[week_name] is not None:
+            week_checkins.update(read_json_file(week_files[week_name]))
+        return sorted(week_checkins.items())
+
+    week_names = sorted(week_files)
+    if len(week_names) <= 1:
+        for week_name in week_names:
+            yield from load_week(week_name)
+        return
+
+    # Read upcoming weeks in parallel, keeping at most CHECKIN_READ_AHEAD weeks in memory
+    with ThreadPoolExecutor(max_workers=CHECKIN_READ_AHEAD) as pool:
+        pending = deque()
+        for week_name in week_names:
+            pending.append(pool.submit(load_week, week_name))
+            if len(pending) >= CHECKIN_READ_AHEAD:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def load_patient_checkins(patient_id):
+    """Load every check-in of a patient, keyed by date (oldest first)"""
+    return dict(iter_patient_checkins(patient_id))
+
+
+# (patient_id, week) -> [names and mtimes of that week's check-in files, week data, JSON response body]
+_WEEK_CACHE = OrderedDict()
+_WEEK_CACHE_LOCK = threading.Lock()
+_WEEK_CACHE_SIZE = 256
+
+
+def load_week_checkins(patient_id, week):
+    """Load a patient's check-ins for a week ("YYYY-W##"), keyed by date"""
+    entry = load_week_cache_entry(patient_id, week)
+    return entry[1] if entry is not None else {}
+
+
+def load_week_checkins_json(patient_id, week):
+    """The get-week-data response body for a patient's week"""
+    entry = load_week_cache_entry(patient_id, week)
+    if entry is None:
+        return app.json.dumps({'success': True, 'weekData': {}}) + '\n'
+
+    if entry[2] is None:
+        entry[2] = (app.json.dumps({'success': True, 'weekData': entry[1]}) + '\n').encode('utf-8')
+    return entry[2]
+
+
+def load_week_cache_entry(patient_id, week):
+    """Return the up-to-date cache entry for a patient's week (None if the patient has no check-ins)"""
+    checkin_dir = os.path.join('therapy_data', 'checkins', patient_id)
+    if not os.path.exists(checkin_dir):
+        return None
+
+    week_dates = get_week_dates(week)
+    week_file = week_checkin_filename(week_dates[0])
+    wanted = {f'checkin_{date_str}.json': date_str for date_str in week_dates}  # Per-day files from older versions
+    wanted[week_file] = None
+
+    # One directory pass tells us which files exist and whether any changed
+    with os.scandir(checkin_dir) as entries:
+        signature = tuple(sorted(
+            (entry.name, entry.stat().st_mtime_ns) for entry in entries if entry.name in wanted
+        ))
+
+    key = (patient_id, week)
+    with _WEEK_CACHE_LOCK:
+        cached = _WEEK_CACHE.get(key)
+        if cached is not None and cached[0] == signature:
+            _WEEK_CACHE.move_to_end(key)
+            return cached
+
+    week_data = {
+        wanted[name]: read_json_file(os.path.join(checkin_dir, name))
+        for name, _ in signature if name != week_file
+    }
+    if any(name == week_file for name, _ in signature):
+        week_data.update(read_json_file(os.path.join(checkin_dir, week_file)))
+
+    entry = [signature, week_data, None]
+    with _WEEK_CACHE_LOCK:
+        _WEEK_CACHE[key] = entry
+        _WEEK_CACHE.move_to_end(key)
+        while len(_WEEK_CACHE) > _WEEK_CACHE_SIZE:
+            _WEEK_CACHE.popitem(last=False)
+
+    return entry
+
+
+_EMAIL_CONFIG = None  # (st_mtime_ns, parsed email_config.json)
+
+
 def get_system_email_config():
     """Get system email configuration"""
     # Priority: Environment variables > Config file > Default
@@ -1043,20 +1569,88 @@ def get_system_email_config():
             'smtp_port': int(os.environ.get('SMTP_PORT', '587'))
         }
 
-    # Check config file
+    # Check config file (parsed again only when it changes)
     email_config_file = os.path.join('therapy_data', 'email_config.json')
-    if os.path.exists(email_config_file):
-        with open(email_config_file, 'r') as f:
-            #return json.load(f)
-            config = json.load(f)
-            print(
-                f"DEBUG: Email config loaded - Email: {config.get('sender_email')}, Password length: {len(config.get('sender_password', ''))}")
-            return config
+    try:
+        mtime = os.stat(email_config_file).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    global _EMAIL_CONFIG
+    if _EMAIL_CONFIG is None or _EMAIL_CONFIG[0] != mtime:
+        _EMAIL_CONFIG = (mtime, read_json_file(email_config_file))
+    return _EMAIL_CONFIG[1]
+
+
+def build_report_email_content(patient_id, week, patient_data, system_name):
+    """Body text of the weekly report email"""
+    week_data = load_week_checkins(patient_id, week)
 
-    return None
+    # Calculate summary (medication adherence leaves out "Not Applicable" days)
+    summary = summarize_week(week_data)
+    completed_days = summary['completed_days']
+    avg_emotional = summary['avg_emotional']
+    avg_medication = summary['avg_medication_applicable']
+    avg_activity = summary['avg_activity']
 
+    return f"""
+Dear {patient_data['therapistName']},
+
+This is the weekly therapy tracking report for {patient_data['name']} (ID: {patient_id}).
 
-def send_email_via_sendgrid(recipient_email, subject, content, attachment_path, reply_to=None):
+Week: {week}
+Completion Rate: {completed_days}/7 days ({completed_days / 7 * 100:.1f}%)
+
+Summary Statistics:
+- Average Emotional State: {avg_emotional:.2f}/5
+- Average Medication Adherence: {avg_medication:.2f}/5 {"(excluding N/A)" if avg_medication > 0 else ""}
+- Average Physical Activity: {avg_activity:.2f}/5
+
+Please find the detailed Excel report attached.
+
+Best regards,
+{system_name}
+
+---
+This is an automated report. Please do not reply to this email.
+Generated by: {request.therapist['name']} ({request.therapist['email']})
+Organization: {request.therapist.get('organization', 'N/A')}
+        """
+
+
+def build_report_message(config, system_name, recipient_email, subject, content, excel_filename,
+                         excel_data, reply_to=None):
+    """Build the report email with its Excel attachment"""
+    msg = MIMEMultipart()
+    msg['From'] = f"{system_name} <{config['sender_email']}>"
+    msg['To'] = recipient_email
+    msg['Subject'] = subject
+    if reply_to:
+        msg['Reply-To'] = reply_to
+
+    # Add body
+    msg.attach(MIMEText(content, 'plain'))
+
+    # Add Excel attachment (the report bytes are already in memory, so encode them directly)
+    part = MIMEBase('application', 'octet-stream')
+    encoded = pybase64.encodebytes(excel_data) if PYBASE64_AVAILABLE else base64.encodebytes(excel_data)
+    part.set_payload(encoded.decode('ascii'))
+    part['Content-Transfer-Encoding'] = 'base64'
+    part.add_header(
+        'Content-Disposition',
+        f'attachment; filename= {excel_filename}'
+    )
+    msg.attach(part)
+
+    return msg
+
+
+@lru_cache(maxsize=1)
+def get_sendgrid_client(api_key):
+    """SendGrid client shared by every send made with this API key"""
+    return sendgrid.SendGridAPIClient(api_key=api_key)
+
+
+def send_email_via_sendgrid(recipient_email, subject, content, attachment_name, attachment_data, reply_to=None):
     """Send email using SendGrid API"""
     if not SENDGRID_AVAILABLE:
         raise Exception("SendGrid not installed")
@@ -1082,53 +1676,316 @@ def send_email_via_sendgrid(recipient_email, subject, content, attachment_path,
         message.reply_to = reply_to
 
     # Add attachment
-    with open(attachment_path, 'rb') as f:
-        data = f.read()
-        encoded = base64.b64encode(data).decode()
-
     attachment = Attachment()
-    attachment.file_content = FileContent(encoded)
+    encoded = pybase64.b64encode(attachment_data) if PYBASE64_AVAILABLE else base64.b64encode(attachment_data)
+    attachment.file_content = FileContent(encoded.decode('ascii'))
     attachment.file_type = FileType('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    attachment.file_name = FileName(os.path.basename(attachment_path))
+    attachment.file_name = FileName(attachment_name)
     attachment.disposition = Disposition('attachment')
 
     message.attachment = attachment
 
     # Send
     try:
-        sg = sendgrid.SendGridAPIClient(api_key=sg_api_key)
-        response = sg.send(message)
+        response = get_sendgrid_client(sg_api_key).send(message)
         return response.status_code == 202
     except Exception as e:
         raise Exception(f"SendGrid error: {str(e)}")
 
 
+SMTP_MAX_MESSAGES_PER_CONNECTION = 5000  # SendGrid closes connections after this many messages
+
+# Provider sending rate (SES allows 14 messages per second), counted per SMTP host in the
+# rate-limit storage. With the default memory:// storage every worker process counts on its own,
+# so N gunicorn workers may send up to N times this rate - set RATELIMIT_STORAGE_URI (or
+# REDIS_URL) to a shared store, or divide SMTP_RATE_LIMIT by the worker count
+SMTP_RATE_LIMIT = parse_limit(os.environ.get('SMTP_RATE_LIMIT', '14 per second'))
+SMTP_RETRY_DELAYS = (1, 2, 4)  # seconds to back off after each temporary (4xx) rejection
+_SMTP_RATE_LIMITER = (
+    MovingWindowRateLimiter if RATELIMIT_STORAGE_URI.startswith('memory://') else FixedWindowRateLimiter
+)(storage_from_string(RATELIMIT_STORAGE_URI))
+
+
+def wait_for_smtp_slot(host):
+    """Block until the provider's sending rate allows another message through host"""
+    while not _SMTP_RATE_LIMITER.hit(SMTP_RATE_LIMIT, 'smtp', host):
+        reset_time, _ = _SMTP_RATE_LIMITER.get_window_stats(SMTP_RATE_LIMIT, 'smtp', host)
+        time.sleep(min(max(reset_time - time.time(), 0.01), SMTP_RATE_LIMIT.get_expiry()))
+
+
+class PooledSMTP:
+    """An SMTP connection that has already done STARTTLS and logged in"""
+
+    def __init__(self, config):
+        self.host = config['smtp_server']
+        self.server = smtplib.SMTP(self.host, config['smtp_port'], timeout=30)
+        if os.environ.get('SMTP_DEBUG'):
+            self.server.set_debuglevel(1)  # Print the SMTP conversation to stderr
+        self.server.starttls()
+        self.server.login(config['sender_email'], config['sender_password'])
+        self.messages_sent = 0
+
+    def send_message(self, msg):
+        """Send within the host's rate limit, backing off exponentially on 4xx throttling"""
+        for delay in SMTP_RETRY_DELAYS + (None,):
+            wait_for_smtp_slot(self.host)
+            try:
+                self.server.send_message(msg)
+                break
+            except smtplib.SMTPResponseException as e:
+                if delay is None or not 400 <= e.smtp_code < 500:
+                    raise
+                if e.smtp_code == 421:
+                    # The server is closing the connection, so RSET would only fail - back off,
+                    # then let the pool discard this connection and the caller redial
+                    self.server.close()
+                    time.sleep(delay)
+                    raise smtplib.SMTPServerDisconnected(str(e)) from e
+                self.reset()  # Abandon the rejected transaction before trying again
+                time.sleep(delay)
+        self.messages_sent += 1
+
+    def reset(self):
+        """Clear the transaction state (RSET) before the next envelope on this connection"""
+        code, response = self.server.rset()
+        if code != 250:
+            raise smtplib.SMTPResponseException(code, response)
+
+    @property
+    def exhausted(self):
+        return self.messages_sent >= SMTP_MAX_MESSAGES_PER_CONNECTION
+
+    def is_healthy(self):
+        """Check the server still answers NOOP on this connection"""
+        try:
+            return self.server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def close(self):
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+
+
+class SMTPPool:
+    """Reuses logged-in SMTP connections so each email skips the TLS and AUTH handshakes"""
+
+    def __init__(self, max_size=5):
+        self.max_size = max_size
+        self.idle = {}  # (server, port, sender) -> deque of idle PooledSMTP
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    @contextmanager
+    def acquire(self, config):
+        """Check out a healthy connection; it goes back to the pool unless sending failed"""
+        key = (config['smtp_server'], config['smtp_port'], config['sender_email'])
+        conn = None
+        while conn is None:
+            with self.lock:
+                if self.pid != os.getpid():
+                    # Connections inherited from a parent process cannot be shared
+                    self.idle = {}
+                    self.pid = os.getpid()
+                idle = self.idle.get(key)
+                if not idle:
+                    break
+                candidate = idle.pop()
+
+            # Health check outside the lock so a slow server does not block other requests
+            if candidate.is_healthy():
+                conn = candidate
+            else:
+                candidate.close()
+
+        if conn is None:
+            conn = PooledSMTP(config)
+
+        try:
+            yield conn
+        except Exception:
+            conn.close()
+            raise
+
+        if not conn.exhausted:
+            with self.lock:
+                idle = self.idle.setdefault(key, deque())
+                if len(idle) < self.max_size:
+                    idle.append(conn)
+                    return
+        conn.close()
+
+
+_SMTP_POOL = SMTPPool()
+
+MAX_BATCH_REPORTS = 50
+
+
+def send_batch(config, outbox):
+    """Send (result, message) pairs over as few SMTP connections as possible, marking each result"""
+    position = 0
+    retried = False
+    while position < len(outbox):
+        connected = sending = False
+        try:
+            with _SMTP_POOL.acquire(config) as conn:
+                connected = True
+                while position < len(outbox) and not conn.exhausted:
+                    result, msg = outbox[position]
+                    sending = True
+                    conn.send_message(msg)
+                    sending = False
+                    result['sent'] = True
+                    position += 1
+                    retried = False
+                    conn.reset()
+        except smtplib.SMTPAuthenticationError as e:
+            for result, _ in outbox[position:]:
+                result['error'] = f"Authentication failed: {str(e)}"
+            return
+        except (smtplib.SMTPException, OSError) as e:
+            if not connected:
+                # Could not open a connection at all - fail the rest instead of redialing forever
+                for result, _ in outbox[position:]:
+                    result['error'] = f"SMTP error: {str(e)}"
+                return
+            if not sending:
+                continue  # The server dropped the connection on RSET - carry on with a fresh one
+            if isinstance(e, smtplib.SMTPServerDisconnected) and not retried:
+                retried = True  # Resend this message once on a new connection
+                continue
+            outbox[position][0]['error'] = f"SMTP error: {str(e)}"
+            position += 1
+            retried = False
+
+
+# Background report jobs run in the worker that accepted them, but their records live in
+# therapy_data/jobs, so a poll reaching any worker (or arriving after a restart) finds them.
+# Each record has a single writer and is replaced atomically, so readers need no lock.
+JOBS_DIR = os.path.join('therapy_data', 'jobs')
+JOB_RETENTION = 60 * 60  # seconds a job's record stays available
+JOB_TIMEOUT = 10 * 60  # a job still running after this long was lost with its worker
+_JOB_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='report-job')
+
+
+def job_file(job_id):
+    """Path of a background job's record"""
+    return os.path.join(JOBS_DIR, f'{job_id}.json')
+
+
+def submit_job(fn, *args):
+    """Run fn(*args) on the job pool for the current therapist; returns the job ID"""
+    job_id = secrets.token_hex(16)
+    now = time.time()
+
+    # Drop job records nobody collected within the retention period
+    for entry in scan_files(JOBS_DIR):
+        if now - entry.stat().st_mtime > JOB_RETENTION:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass  # Removed by another worker
+
+    job = {'therapist': request.therapist['email'], 'submitted': now, 'status': 'running'}
+    replace_json_file(job_file(job_id), job)
+    _JOB_EXECUTOR.submit(run_job, job_id, job, fn, *args)
+    return job_id
+
+
+def run_job(job_id, job, fn, *args):
+    """Run a job and record its (response data, HTTP status) result or error"""
+    try:
+        result, status = fn(*args)
+        job.update(status='done', httpStatus=status, result=result)
+    except Exception as e:
+        job.update(status='error', error=str(e))
+    replace_json_file(job_file(job_id), job)
+
+
+def get_job(job_id):
+    """Look up a job's record (therapist, submitted, status and outcome), or None"""
+    if len(job_id) != 32 or not all(c in '0123456789abcdef' for c in job_id):
+        return None  # Not an ID submit_job could have issued
+    try:
+        job = read_json_file(job_file(job_id))
+    except (OSError, ValueError):
+        return None
+
+    if job['status'] == 'running' and time.time() - job['submitted'] > JOB_TIMEOUT:
+        job.update(status='error', error='Job was interrupted before it finished')
+    return job
+
+
+_LOG_QUEUE = queue.Queue()
+_log_worker = None
+_LOG_WORKER_LOCK = threading.Lock()
+
+
 def log_activity(activity_type, data):
-    """Log system activity"""
-    log_entry = {
+    """Log system activity (written to disk by a background thread)"""
+    global _log_worker
+    _LOG_QUEUE.put_nowait({
         'timestamp': datetime.now().isoformat(),
         'activity': activity_type,
         'data': data
-    }
+    })
 
-    # Create log file for today
-    log_date = datetime.now().strftime('%Y-%m-%d')
-    log_file = os.path.join('therapy_data', 'logs', f'activity_{log_date}.json')
+    # Started on first use so forked servers get their own writer thread
+    if _log_worker is None or not _log_worker.is_alive():
+        with _LOG_WORKER_LOCK:
+            if _log_worker is None or not _log_worker.is_alive():
+                _log_worker = threading.Thread(target=activity_log_worker, daemon=True)
+                _log_worker.start()
 
-    # Read existing log
-    if os.path.exists(log_file):
-        with open(log_file, 'r') as f:
-            log_data = json.load(f)
-    else:
-        log_data = []
 
-    # Append new entry
-    log_data.append(log_entry)
+def activity_log_worker():
+    """Write queued activity log entries so requests never wait on the log file"""
+    while True:
+        # Everything queued while the last batch was written goes out in one append per file
+        log_entries = [_LOG_QUEUE.get()]
+        while True:
+            try:
+                log_entries.append(_LOG_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+
+        try:
+            write_activity_log_entries(log_entries)
+        except Exception as e:
+            print(f"Activity log error: {e}")
+        finally:
+            for _ in log_entries:
+                _LOG_QUEUE.task_done()
+
+
+@atexit.register
+def flush_activity_log():
+    """Wait for queued log entries to reach disk before the process exits"""
+    if _log_worker is not None and _log_worker.is_alive():
+        _LOG_QUEUE.join()
+
+
+def write_activity_log_entries(log_entries):
+    """Append entries as JSON lines to the log file for the day each was logged"""
+    lines_by_file = {}
+    for log_entry in log_entries:
+        log_date = log_entry['timestamp'][:10]
+        log_file = os.path.join('therapy_data', 'logs', f'activity_{log_date}.jsonl')
+
+        if ORJSON_AVAILABLE:
+            line = orjson.dumps(log_entry, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+        else:
+            line = (json.dumps(log_entry, separators=(',', ':'), ensure_ascii=False) + '\n').encode('utf-8')
+        lines_by_file.setdefault(log_file, []).append(line)
 
-    # Save log
-    os.makedirs(os.path.dirname(log_file), exist_ok=True)
-    with open(log_file, 'w') as f:
-        json.dump(log_data, f, indent=2)
+    for log_file, lines in lines_by_file.items():
+        ensure_dir(os.path.dirname(log_file))
+        with open(log_file, 'ab') as f:
+            if FCNTL_AVAILABLE:
+                fcntl.flock(f, fcntl.LOCK_EX)  # Released when the file is closed
+            f.write(b''.join(lines))
 
 
 # ============= DATA PRIVACY ENDPOINTS =============
@@ -1139,22 +1996,22 @@ def delete_patient_data(patient_id):
     """GDPR compliance - delete all patient data"""
     try:
         # Verify ownership
-        patient_file = os.path.join('therapy_data', 'patients', f'patient_{patient_id}.json')
-        if os.path.exists(patient_file):
-            with open(patient_file, 'r') as f:
-                patient = json.load(f)
-
+        patient = get_patient(patient_id)
+        if patient is not None:
             if patient.get('enrolledBy') != request.therapist['email'] and request.therapist['email'] != 'admin@system':
                 return jsonify({'success': False, 'error': 'Unauthorized'}), 403
 
         # Delete patient file
+        patient_file = os.path.join('therapy_data', 'patients', f'patient_{patient_id}.json')
         if os.path.exists(patient_file):
             os.remove(patient_file)
+            unindex_patient(patient_id)
+            update_counter('patients', -1)
 
         # Delete all check-ins
         checkin_dir = os.path.join('therapy_data', 'checkins', patient_id)
         if os.path.exists(checkin_dir):
-            shutil.rmtree(checkin_dir)
+            remove_checkin_dir(checkin_dir)
 
         # Log deletion
         log_activity('patient_deleted', {
@@ -1180,31 +2037,27 @@ def export_patient_data(patient_id):
     """GDPR compliance - export all patient data"""
     try:
         # Verify ownership
-        patient_file = os.path.join('therapy_data', 'patients', f'patient_{patient_id}.json')
-        if os.path.exists(patient_file):
-            with open(patient_file, 'r') as f:
-                patient = json.load(f)
-
+        patient = get_patient(patient_id)
+        if patient is not None:
             if patient.get('enrolledBy') != request.therapist['email'] and request.therapist['email'] != 'admin@system':
                 return jsonify({'success': False, 'error': 'Unauthorized'}), 403
         else:
             return jsonify({'success': False, 'error': 'Patient not found'}), 404
 
-        # Collect all patient data
-        export_data = {
+        export_info = {
             'patient_info': patient,
-            'checkins': [],
             'export_date': datetime.now().isoformat(),
             'exported_by': request.therapist['email']
         }
 
-        # Get all check-ins
-        checkin_dir = os.path.join('therapy_data', 'checkins', patient_id)
-        if os.path.exists(checkin_dir):
-            for filename in sorted(os.listdir(checkin_dir)):
-                if filename.endswith('.json'):
-                    with open(os.path.join(checkin_dir, filename), 'r') as f:
-                        export_data['checkins'].append(json.load(f))
+        def generate_export():
+            """Stream the export object, reading the check-ins one week at a time"""
+            yield app.json.dumps(export_info)[:-1] + ',"checkins":['
+            separator = ''
+            for _, checkin in iter_patient_checkins(patient_id):
+                yield separator + app.json.dumps(checkin)
+                separator = ','
+            yield ']}'
 
         # Log export
         log_activity('patient_data_exported', {
@@ -1214,7 +2067,7 @@ def export_patient_data(patient_id):
 
         # Return as JSON file
         return Response(
-            json.dumps(export_data, indent=2),
+            generate_export(),
             mimetype='application/json',
             headers={
                 'Content-Disposition': f'attachment; filename=patient_data_{patient_id}_{datetime.now().strftime("%Y%m%d")}.json'
@@ -1228,34 +2081,57 @@ def export_patient_data(patient_id):
         }), 500
 
 
+def remove_checkin_dir(checkin_dir):
+    """Take a patient's check-ins out of service at once and delete the files in the background"""
+    # A rename is atomic, so the check-ins are gone for every reader before this returns
+    deleted_dir = os.path.join(os.path.dirname(checkin_dir),
+                               f'.deleted_{os.path.basename(checkin_dir)}_{secrets.token_hex(4)}')
+    os.rename(checkin_dir, deleted_dir)
+    forget_dir(checkin_dir)
+
+    def remove():
+        checkin_count = sum(
+            len(read_json_file(entry.path)) if entry.name.startswith('week_') else 1
+            for entry in scan_files(deleted_dir)
+        )
+        shutil.rmtree(deleted_dir, ignore_errors=True)
+        update_counter('checkins', -checkin_count)
+
+    # Not a daemon thread, so shutdown waits for the files to be removed
+    threading.Thread(target=remove).start()
+
+
 # ============= HEALTH CHECK ENDPOINTS =============
 
+# Everything in the health response except the timestamp is fixed once the process starts
+HEALTH_INFO = {
+    'status': 'healthy',
+    'service': 'Enhanced Therapeutic Companion Backend',
+    'version': '2.0',
+    'features': [
+        'Multi-user support with authentication',
+        'Patient enrollment and management',
+        'Daily check-ins (emotional, medication, physical)',
+        '7-day weekly tracking',
+        'Excel report generation',
+        'Email report with system account',
+        'Rate limiting for security',
+        'GDPR compliance features',
+        'Activity logging'
+    ],
+    'security': {
+        'authentication': 'Token-based',
+        'rate_limiting': 'Enabled',
+        'cors': 'Configured',
+        'https_only_cookies': os.environ.get('PRODUCTION', False)
+    }
+}
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Simple health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'service': 'Enhanced Therapeutic Companion Backend',
-        'version': '2.0',
-        'features': [
-            'Multi-user support with authentication',
-            'Patient enrollment and management',
-            'Daily check-ins (emotional, medication, physical)',
-            '7-day weekly tracking',
-            'Excel report generation',
-            'Email report with system account',
-            'Rate limiting for security',
-            'GDPR compliance features',
-            'Activity logging'
-        ],
-        'security': {
-            'authentication': 'Token-based',
-            'rate_limiting': 'Enabled',
-            'cors': 'Configured',
-            'https_only_cookies': os.environ.get('PRODUCTION', False)
-        },
-        'timestamp': datetime.now().isoformat()
-    })
+    return jsonify(dict(HEALTH_INFO, timestamp=datetime.now().isoformat()))
 
 
 @app.route('/api/stats', methods=['GET'])
@@ -1266,35 +2142,7 @@ def get_system_stats():
         return jsonify({'error': 'Admin access required'}), 403
 
     try:
-        stats = {
-            'therapists': 0,
-            'patients': 0,
-            'checkins': 0,
-            'reports_generated': 0
-        }
-
-        # Count therapists
-        therapists_dir = os.path.join('therapy_data', 'therapists')
-        if os.path.exists(therapists_dir):
-            stats['therapists'] = len([f for f in os.listdir(therapists_dir) if f.endswith('.json')])
-
-        # Count patients
-        patients_dir = os.path.join('therapy_data', 'patients')
-        if os.path.exists(patients_dir):
-            stats['patients'] = len([f for f in os.listdir(patients_dir) if f.endswith('.json')])
-
-        # Count checkins
-        checkins_dir = os.path.join('therapy_data', 'checkins')
-        if os.path.exists(checkins_dir):
-            for patient_dir in os.listdir(checkins_dir):
-                patient_checkins = os.path.join(checkins_dir, patient_dir)
-                if os.path.isdir(patient_checkins):
-                    stats['checkins'] += len([f for f in os.listdir(patient_checkins) if f.endswith('.json')])
-
-        # Count reports
-        reports_dir = os.path.join('therapy_data', 'excel_exports')
-        if os.path.exists(reports_dir):
-            stats['reports_generated'] = len([f for f in os.listdir(reports_dir) if f.endswith('.xlsx')])
+        stats = load_system_stats()
 
         return jsonify({
             'success': True,
@@ -1309,6 +2157,89 @@ def get_system_stats():
         }), 500
 
 
+COUNTERS_FILE = os.path.join('therapy_data', '.counters.json')
+_COUNTERS_LOCK = threading.Lock()
+
+
+def count_system_stats():
+    """Count therapists, patients, check-ins and reports from the files on disk"""
+    stats = {
+        'therapists': 0,
+        'patients': 0,
+        'checkins': 0,
+        'reports_generated': 0
+    }
+
+    # Count therapists
+    stats['therapists'] = len(scan_files(os.path.join('therapy_data', 'therapists')))
+
+    # Count patients
+    stats['patients'] = len(scan_files(os.path.join('therapy_data', 'patients')))
+
+    # Count checkins
+    checkins_dir = os.path.join('therapy_data', 'checkins')
+    try:
+        with os.scandir(checkins_dir) as patient_dirs:
+            for patient_dir in patient_dirs:
+                if patient_dir.is_dir() and not patient_dir.name.startswith('.'):
+                    stats['checkins'] += len(load_patient_checkins(patient_dir.name))
+    except FileNotFoundError:
+        pass
+
+    # Count reports
+    stats['reports_generated'] = len(scan_files(os.path.join('therapy_data', 'excel_exports'), '.xlsx'))
+
+    return stats
+
+
+@contextmanager
+def locked_counters_file():
+    """Open the counters file for update (creating it empty), under the thread lock and, with fcntl, a flock"""
+    with _COUNTERS_LOCK:
+        with os.fdopen(os.open(COUNTERS_FILE, os.O_RDWR | os.O_CREAT, 0o644), 'r+b') as f:
+            if FCNTL_AVAILABLE:
+                fcntl.flock(f, fcntl.LOCK_EX)  # Released when the file is closed
+            yield f
+
+
+def read_counters(f):
+    """Parse the locked counters file (None if it was just created or is corrupt)"""
+    try:
+        counters = json.loads(f.read())
+    except ValueError:
+        return None
+    return counters if isinstance(counters, dict) else None
+
+
+def write_counters(f, counters):
+    """Replace the contents of the locked counters file"""
+    f.seek(0)
+    f.truncate()
+    f.write(json.dumps(counters).encode('utf-8'))
+
+
+def load_system_stats():
+    """Read the maintained stats counters, counting from disk the first time (or if the file is corrupt)"""
+    with locked_counters_file() as f:
+        stats = read_counters(f)
+        if stats is None:
+            stats = count_system_stats()
+            write_counters(f, stats)
+        return stats
+
+
+def update_counter(name, delta=1):
+    """Adjust one stats counter, counting from disk instead if the counters file is missing or corrupt"""
+    with locked_counters_file() as f:
+        counters = read_counters(f)
+        if counters is None:
+            # Callers update the counter after changing the files, so a fresh count already includes this change
+            counters = count_system_stats()
+        else:
+            counters[name] = max(0, counters.get(name, 0) + delta)
+        write_counters(f, counters)
+
+
 # ============= ERROR HANDLERS =============
 
 @app.errorhandler(429)
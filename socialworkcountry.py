@@ -1,10 +1,14 @@
 import datetime
 import json
+import sys
 from dataclasses import dataclass
 from typing import List, Dict, Optional, Tuple
 
+# dataclass(slots=True) needs Python 3.10; older interpreters keep a regular per-instance __dict__
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
 
-@dataclass
+
+@dataclass(**_SLOTS)
 class PatientProfile:
     """Enhanced data structure to store comprehensive patient information including country"""
     name: str
@@ -241,6 +245,23 @@ class GlobalHealthDatabase:
 
 
 class GlobalSocialWorkerChatbot:
+    # Country-specific major cities (built once, not on every city lookup)
+    MAJOR_CITIES_BY_COUNTRY = {
+        "united_states": ["new york", "los angeles", "chicago", "houston", "phoenix", "philadelphia",
+                          "san antonio", "san diego", "dallas", "san jose", "austin", "jacksonville"],
+        "canada": ["toronto", "montreal", "vancouver", "calgary", "edmonton", "ottawa", "winnipeg"],
+        "united_kingdom": ["london", "birmingham", "manchester", "glasgow", "liverpool", "leeds", "sheffield"],
+        "australia": ["sydney", "melbourne", "brisbane", "perth", "adelaide", "gold coast", "canberra"],
+        "germany": ["berlin", "hamburg", "munich", "cologne", "frankfurt", "stuttgart", "düsseldorf"],
+        "japan": ["tokyo", "osaka", "yokohama", "nagoya", "sapporo", "fukuoka", "kyoto"],
+        "india": ["mumbai", "delhi", "bangalore", "kolkata", "chennai", "hyderabad", "pune"],
+        "brazil": ["são paulo", "rio de janeiro", "brasília", "salvador", "fortaleza", "belo horizonte"],
+        "south_africa": ["johannesburg", "cape town", "durban", "pretoria", "port elizabeth"],
+        "sweden": ["stockholm", "göteborg", "malmö", "uppsala", "västerås", "örebro"],
+        "israel": ["tel aviv", "jerusalem", "haifa", "rishon lezion", "petah tikva", "ashdod", "netanya"],
+        "france": ["paris", "marseille", "lyon", "toulouse", "nice", "nantes", "strasbourg", "montpellier"]
+    }
+
     def __init__(self):
         self.current_patient = None
         self.session_active = False
@@ -286,25 +307,8 @@ class GlobalSocialWorkerChatbot:
         """Categorize city size with country context"""
         city_lower = city.lower().strip()
 
-        # Country-specific major cities
-        major_cities_by_country = {
-            "united_states": ["new york", "los angeles", "chicago", "houston", "phoenix", "philadelphia",
-                              "san antonio", "san diego", "dallas", "san jose", "austin", "jacksonville"],
-            "canada": ["toronto", "montreal", "vancouver", "calgary", "edmonton", "ottawa", "winnipeg"],
-            "united_kingdom": ["london", "birmingham", "manchester", "glasgow", "liverpool", "leeds", "sheffield"],
-            "australia": ["sydney", "melbourne", "brisbane", "perth", "adelaide", "gold coast", "canberra"],
-            "germany": ["berlin", "hamburg", "munich", "cologne", "frankfurt", "stuttgart", "düsseldorf"],
-            "japan": ["tokyo", "osaka", "yokohama", "nagoya", "sapporo", "fukuoka", "kyoto"],
-            "india": ["mumbai", "delhi", "bangalore", "kolkata", "chennai", "hyderabad", "pune"],
-            "brazil": ["são paulo", "rio de janeiro", "brasília", "salvador", "fortaleza", "belo horizonte"],
-            "south_africa": ["johannesburg", "cape town", "durban", "pretoria", "port elizabeth"],
-            "sweden": ["stockholm", "göteborg", "malmö", "uppsala", "västerås", "örebro"],
-            "israel": ["tel aviv", "jerusalem", "haifa", "rishon lezion", "petah tikva", "ashdod", "netanya"],
-            "france": ["paris", "marseille", "lyon", "toulouse", "nice", "nantes", "strasbourg", "montpellier"]
-        }
-
-        if country in major_cities_by_country:
-            for major_city in major_cities_by_country[country]:
+        if country in self.MAJOR_CITIES_BY_COUNTRY:
+            for major_city in self.MAJOR_CITIES_BY_COUNTRY[country]:
                 if major_city in city_lower:
                     return "major_city"
 
@@ -46,7 +46,8 @@ def check_files():
     """Check if required files exist"""
     required_files = [
         'therapy_tracker.html',
-        'socialworkcountry.py'
+        'socialworkcountry.py',
+        'web_common.py'
     ]
     
     # Check for backend (either one)
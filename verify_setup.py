@@ -19,7 +19,8 @@ def check_files():
         'app.py': False,
         'web_backend.py': False,
         'therapy_tracker.html': False,
-        'socialworkcountry.py': False
+        'socialworkcountry.py': False,
+        'web_common.py': False
     }
     
     for filename in required_files:
@@ -0,0 +1,80 @@
+"""
+Import location cache for faster second launches
+Records where every module was loaded from on a successful start-up and,
+on the next launch, resolves those modules straight from the recorded file
+instead of searching every sys.path entry.
+"""
+
+import importlib.machinery
+import importlib.util
+import json
+import os
+import sys
+from pathlib import Path
+
+CACHE_PATH = Path('therapy_data') / '.import_cache.json'
+
+_FILE_LOADERS = (
+    importlib.machinery.SourceFileLoader,
+    importlib.machinery.SourcelessFileLoader,
+    importlib.machinery.ExtensionFileLoader,
+)
+
+
+class CachedLocationFinder:
+    """Meta path finder that serves module specs from the recorded locations"""
+
+    def __init__(self, entries):
+        self.entries = entries  # module name -> [file path, mtime]
+
+    def find_spec(self, fullname, path=None, target=None):
+        entry = self.entries.get(fullname)
+        if entry is None:
+            return None
+
+        origin, mtime = entry
+        try:
+            if os.stat(origin).st_mtime != mtime:
+                raise OSError('stale entry')
+        except OSError:
+            # File moved or changed - forget it and let the normal finders search
+            del self.entries[fullname]
+            return None
+
+        return importlib.util.spec_from_file_location(fullname, origin)
+
+    def invalidate_caches(self):
+        self.entries.clear()
+
+
+def install(cache_path=CACHE_PATH):
+    """Put the cached finder in front of the default finders, if a cache exists"""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    finder = CachedLocationFinder(entries)
+    sys.meta_path.insert(0, finder)
+    return finder
+
+
+def record(cache_path=CACHE_PATH):
+    """Save the file location of every module loaded so far"""
+    entries = {}
+    for name, module in list(sys.modules.items()):
+        spec = getattr(module, '__spec__', None)
+        if spec is None or not spec.has_location or not isinstance(spec.loader, _FILE_LOADERS):
+            continue
+        try:
+            entries[name] = [spec.origin, os.stat(spec.origin).st_mtime]
+        except OSError:
+            continue
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+    except OSError:
+        pass  # The cache is only an optimization
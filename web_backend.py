@@ -3,20 +3,24 @@ Therapeutic Companion Web Backend
 Integrates with Social Worker Assessment System
 """
 
-from flask import Flask, request, jsonify, send_file, render_template_string
+from flask import Flask, request, jsonify, send_file, render_template_string, Response
 from flask_cors import CORS
 import json
 import os
 import csv
 import io
 from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 
 # Import the social worker components
 from socialworkcountry import GlobalSocialWorkerChatbot, PatientProfile
+from web_common import ORJSON_AVAILABLE, OrjsonProvider, load_index_page, read_json_file, write_json_file
 
 # Create Flask app
 app = Flask(__name__)
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
 CORS(app)  # Enable CORS for all routes
 
 # Create data directories
@@ -33,8 +37,11 @@ def index():
     """Serve the main HTML file"""
     # Check if client.html exists
     if os.path.exists('client.html'):
-        with open('client.html', 'r', encoding='utf-8') as f:
-            return f.read()
+        page, etag = load_index_page('client.html')
+        response = Response(page, mimetype='text/html')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'public, max-age=300'
+        return response.make_conditional(request)
     else:
         return """
         <html>
@@ -54,6 +61,44 @@ def index():
 
 # ============= SOCIAL WORKER ASSESSMENT ENDPOINTS =============
 
+# Risk level for each mental state (anything else is 'low')
+RISK_LEVELS = {'Critical': 'critical', 'Poor': 'high', 'Fair': 'moderate'}
+IMMEDIATE_ATTENTION_STATES = frozenset({'Critical', 'Poor'})
+
+@lru_cache(maxsize=4096)
+def run_assessments(country, age, employment_status, exercise_level, mental_state, financial_status):
+    """Run the four chatbot assessments for the profile fields they read (shared, do not mutate)"""
+    # The assessments never look at name, city, gender or notes, so profiles differing only there share results
+    patient = PatientProfile(
+        name='',
+        age=age,
+        country=country,
+        city='',
+        gender='',
+        employment_status=employment_status,
+        exercise_level=exercise_level,
+        mental_state=mental_state,
+        financial_status=financial_status
+    )
+    return (
+        chatbot.assess_country_specific_health_needs(patient),
+        chatbot.assess_country_specific_safety_needs(patient),
+        chatbot.generate_country_evidence_recommendations(patient),
+        chatbot.generate_comprehensive_recommendations(patient)
+    )
+
+@lru_cache(maxsize=64)
+def get_country_context(country):
+    """Country summary for assessment results (depends only on the country's health data)"""
+    country_data = chatbot.health_db.country_health_data.get(country, {})
+    return {
+        'name': country.replace('_', ' ').title(),
+        'mental_health_prevalence': country_data.get('mental_health_prevalence', 0.20) * 100,
+        'healthcare_system': country_data.get('healthcare_system', 'Unknown').replace('_', ' ').title(),
+        'common_health_issues': country_data.get('common_health_issues', []),
+        'crisis_resources': country_data.get('crisis_resources', [])
+    }
+
 @app.route('/api/assess', methods=['POST'])
 def assess_patient():
     """Run comprehensive social worker assessment"""
@@ -74,15 +119,12 @@ def assess_patient():
             additional_notes=data.get('notes', '')
         )
         
-        # Run assessments
+        # Run assessments (cached per combination of the fields they depend on)
         chatbot.current_patient = patient
-        country_health_needs = chatbot.assess_country_specific_health_needs(patient)
-        country_safety_needs = chatbot.assess_country_specific_safety_needs(patient)
-        country_evidence_recs = chatbot.generate_country_evidence_recommendations(patient)
-        general_recommendations = chatbot.generate_comprehensive_recommendations(patient)
-        
-        # Get country context
-        country_data = chatbot.health_db.country_health_data.get(patient.country, {})
+        country_health_needs, country_safety_needs, country_evidence_recs, general_recommendations = run_assessments(
+            patient.country, patient.age, patient.employment_status, patient.exercise_level,
+            patient.mental_state, patient.financial_status
+        )
         
         # Prepare response
         result = {
@@ -98,18 +140,10 @@ def assess_patient():
                 'exercise_level': patient.exercise_level,
                 'mental_state': patient.mental_state
             },
-            'country_context': {
-                'name': patient.country.replace('_', ' ').title(),
-                'mental_health_prevalence': country_data.get('mental_health_prevalence', 0.20) * 100,
-                'healthcare_system': country_data.get('healthcare_system', 'Unknown').replace('_', ' ').title(),
-                'common_health_issues': country_data.get('common_health_issues', []),
-                'crisis_resources': country_data.get('crisis_resources', [])
-            },
+            'country_context': get_country_context(patient.country),
             'risk_indicators': {
-                'level': 'critical' if patient.mental_state == 'Critical' else 
-                        'high' if patient.mental_state == 'Poor' else 
-                        'moderate' if patient.mental_state == 'Fair' else 'low',
-                'requires_immediate_attention': patient.mental_state in ['Critical', 'Poor']
+                'level': RISK_LEVELS.get(patient.mental_state, 'low'),
+                'requires_immediate_attention': patient.mental_state in IMMEDIATE_ATTENTION_STATES
             },
             'assessments': {
                 'country_health_needs': country_health_needs,
@@ -130,27 +164,19 @@ def assess_patient():
             'error': str(e)
         }), 500
 
+# The country list is fixed, so its response body is serialized once at start-up
+COUNTRIES_BODY = (app.json.dumps({
+    'success': True,
+    'countries': [
+        {'code': code, 'name': name, 'key': key}
+        for key, (code, name) in chatbot.get_country_list().items()
+    ]
+}) + '\n').encode('utf-8')
+
 @app.route('/api/countries', methods=['GET'])
 def get_countries():
     """Get list of available countries"""
-    try:
-        countries = []
-        for key, (code, name) in chatbot.get_country_list().items():
-            countries.append({
-                'code': code,
-                'name': name,
-                'key': key
-            })
-        
-        return jsonify({
-            'success': True,
-            'countries': countries
-        })
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+    return Response(COUNTRIES_BODY, mimetype='application/json')
 
 @app.route('/api/emergency-resources/<country_code>', methods=['GET'])
 def get_emergency_resources(country_code):
@@ -185,8 +211,7 @@ def save_assessment():
         filepath = os.path.join('therapy_data', 'reports', filename)
         
         # Save data
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(assessment_data, f, indent=2, ensure_ascii=False)
+        write_json_file(filepath, assessment_data, indent=True)
         
         return jsonify({
             'success': True,
@@ -220,8 +245,7 @@ def save_therapy_patient():
         filename = f'patient_{patient_id}.json'
         filepath = os.path.join('therapy_data', 'patients', filename)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(patient_data, f, indent=2, ensure_ascii=False)
+        write_json_file(filepath, patient_data, indent=True)
         
         return jsonify({
             'success': True,
@@ -259,8 +283,7 @@ def save_therapy_checkin():
         filename = f'checkin_{date}.json'
         filepath = os.path.join(patient_dir, filename)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(checkin_data, f, indent=2, ensure_ascii=False)
+        write_json_file(filepath, checkin_data, indent=True)
         
         return jsonify({
             'success': True,
@@ -302,8 +325,7 @@ def get_week_data(patient_id, week):
                 
                 checkin_file = os.path.join(checkin_dir, f'checkin_{date_str}.json')
                 if os.path.exists(checkin_file):
-                    with open(checkin_file, 'r', encoding='utf-8') as f:
-                        week_data[date_str] = json.load(f)
+                    week_data[date_str] = read_json_file(checkin_file)
         
         return jsonify({
             'success': True,
@@ -327,9 +349,7 @@ def get_all_therapy_patients():
             for filename in os.listdir(patients_dir):
                 if filename.startswith('patient_') and filename.endswith('.json'):
                     filepath = os.path.join(patients_dir, filename)
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        patient_data = json.load(f)
-                        patients.append(patient_data)
+                    patients.append(read_json_file(filepath))
         
         return jsonify({
             'success': True,
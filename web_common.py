@@ -0,0 +1,83 @@
+"""
+Shared helpers for the Therapeutic Companion web backends
+Used by both enhanced_therapy_backend.py and web_backend.py
+"""
+
+from flask.json.provider import DefaultJSONProvider
+import hashlib
+import json
+import os
+
+# Optional: orjson support for faster JSON responses and file persistence
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that parses request bodies and builds jsonify responses with orjson"""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self._options()
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option) + b"\n",
+            mimetype=self.mimetype
+        )
+
+    def _options(self):
+        # Dates still go through Flask's default handler so they serialize exactly as before
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+
+# ============= JSON PERSISTENCE =============
+
+def read_json_file(path):
+    """Load a JSON file (read as bytes; both parsers decode UTF-8 themselves)"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
+
+
+def write_json_file(path, data, indent=False):
+    """Save data as compact UTF-8 JSON (indent=True for files people edit by hand)"""
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=option))
+        return
+    with open(path, 'wb') as f:
+        f.write(json.dumps(data, indent=2 if indent else None, ensure_ascii=False).encode('utf-8'))
+
+
+# ============= STATIC PAGES =============
+
+_INDEX_PAGE = {}  # path -> (mtime, page bytes, ETag)
+
+
+def load_index_page(path):
+    """Read an HTML page once and keep its bytes and ETag until the file changes"""
+    mtime = os.stat(path).st_mtime_ns
+    cached = _INDEX_PAGE.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            page = f.read()
+        cached = (mtime, page, hashlib.sha256(page).hexdigest())
+        _INDEX_PAGE[path] = cached
+    return cached[1], cached[2]